@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+
+import bpy
+import bmesh
+import numpy as np
+
+from blender import Blender
+
+
+#  python benchmark.py --levels 0 1 2 3 --output bench.json
+#  python benchmark.py --levels 0 1 2 3 --baseline bench.json --threshold 0.2
+
+SHAPES = ("cube", "suzanne")
+DEFAULT_LEVELS = (0, 1, 2, 3)
+DEFAULT_SCENE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blank.blend")
+
+#セッションを使わない locate_vertex の呼び出し回数（1 回ごとに BMesh を作るため全頂点は回さない）
+LOCATE_CALLS = 100
+
+
+#ベンチマーク用のメッシュを作成（level 回、全エッジを 1 分割する）
+def make_mesh(blender: Blender, shape: str, level: int) -> str:
+    if shape == "cube":
+        name = blender.add_cube(0, 0, 0)
+    elif shape == "suzanne":
+        name = blender.add_suzanne(0, 0, 0)
+    else:
+        raise ValueError(f"unknown shape: {shape}")
+
+    mesh = blender.get_object(name).data
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    for _ in range(level):
+        bmesh.ops.subdivide_edges(bm, edges=bm.edges[:], cuts=1, use_grid_fill=True)
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+    return name
+
+
+#=============================================================================================
+#計測対象の操作（blender, オブジェクト名, 作業ディレクトリ）
+
+def bench_locate_vertex(blender: Blender, name: str, workdir: str):
+    for i in range(min(LOCATE_CALLS, blender.count_vertex(name))):
+        blender.locate_vertex(name, i)
+
+def bench_locate_vertex_session(blender: Blender, name: str, workdir: str):
+    with blender.mesh_session(name):
+        for i in range(blender.count_vertex(name)):
+            blender.locate_vertex(name, i)
+
+def bench_get_convex_vertices(blender: Blender, name: str, workdir: str):
+    blender.get_convex_vertices(name)
+
+def bench_get_vertices_in_direction(blender: Blender, name: str, workdir: str):
+    blender.get_vertices_in_direction(name, (1, 0, 0))
+
+def bench_stretch_cube_along_vector(blender: Blender, name: str, workdir: str):
+    blender.stretch_cube_along_vector(name, (1, 0, 0), 0.5)
+
+def bench_boolean_union_multiple(blender: Blender, name: str, workdir: str):
+    # 角に重なる小さな立方体を 4 つ統合する
+    cubes = blender.add_cubes([(0.8, 0.8, 0.8), (-0.8, 0.8, 0.8), (0.8, -0.8, 0.8), (0.8, 0.8, -0.8)], scales=0.4)
+    blender.boolean_union_multiple(name, cubes, mode="COLLECTION")
+
+def bench_render(blender: Blender, name: str, workdir: str):
+    blender.render(os.path.join(workdir, "render.png"), use_cache=False, profile="preview",
+                   settings={"render.resolution_x": 128, "render.resolution_y": 128})
+
+def bench_save_scene(blender: Blender, name: str, workdir: str):
+    blender.save_scene_copy(os.path.join(workdir, "scene.blend"))
+
+OPERATIONS = {
+    "locate_vertex": bench_locate_vertex,
+    "locate_vertex_session": bench_locate_vertex_session,
+    "get_convex_vertices": bench_get_convex_vertices,
+    "get_vertices_in_direction": bench_get_vertices_in_direction,
+    "stretch_cube_along_vector": bench_stretch_cube_along_vector,
+    "boolean_union_multiple": bench_boolean_union_multiple,
+    "render": bench_render,
+    "save_scene": bench_save_scene,
+}
+
+#=============================================================================================
+#計測
+
+#プロセスの最大常駐メモリ（バイト）
+def max_rss() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+#一つの操作を repeat 回計測する（メッシュの作成は計測に含めない）
+#時間の計測と tracemalloc によるメモリの計測は別の実行で行う
+def run_case(blender: Blender, shape: str, level: int, operation: str, repeat: int, workdir: str) -> dict:
+    function = OPERATIONS[operation]
+    seconds = []
+    for _ in range(repeat):
+        blender.reset()
+        name = make_mesh(blender, shape, level)
+        start = time.perf_counter()
+        function(blender, name, workdir)
+        seconds.append(time.perf_counter() - start)
+
+    blender.reset()
+    name = make_mesh(blender, shape, level)
+    mesh = blender.get_object(name).data
+    vertices, faces = len(mesh.vertices), len(mesh.polygons)
+    tracemalloc.start()
+    try:
+        function(blender, name, workdir)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "shape": shape,
+        "level": level,
+        "operation": operation,
+        "vertices": vertices,
+        "faces": faces,
+        "seconds": float(np.median(seconds)),
+        "seconds_min": min(seconds),
+        "runs": seconds,
+        "peak_python_bytes": peak,
+        "max_rss_bytes": max_rss(),
+    }
+
+
+#操作ごとに log(時間) と log(頂点数) の傾きを求める（1 なら線形、2 なら二乗）
+def complexity(results: list[dict]) -> dict:
+    curves = {}
+    for result in results:
+        curves.setdefault((result["shape"], result["operation"]), []).append(result)
+
+    slopes = {}
+    for (shape, operation), points in curves.items():
+        points = [p for p in points if p["seconds"] > 0]
+        if len({p["vertices"] for p in points}) < 2:
+            continue
+        x = np.log([p["vertices"] for p in points])
+        y = np.log([p["seconds"] for p in points])
+        slopes.setdefault(shape, {})[operation] = float(np.polyfit(x, y, 1)[0])
+    return slopes
+
+
+#基準の結果と比較し、threshold（0.2 なら 20%）以上遅くなったものを回帰とする
+def compare(results: list[dict], baseline: dict, threshold: float) -> list[dict]:
+    reference = {(r["shape"], r["level"], r["operation"]): r for r in baseline["results"]}
+    comparison = []
+    for result in results:
+        past = reference.get((result["shape"], result["level"], result["operation"]))
+        if past is None or past["seconds"] <= 0:
+            continue
+        ratio = result["seconds"] / past["seconds"]
+        comparison.append({
+            "shape": result["shape"],
+            "level": result["level"],
+            "operation": result["operation"],
+            "baseline_seconds": past["seconds"],
+            "seconds": result["seconds"],
+            "ratio": ratio,
+            "regression": ratio > 1.0 + threshold,
+        })
+    return comparison
+
+
+def run(levels=DEFAULT_LEVELS, shapes=SHAPES, operations=None, repeat: int = 3,
+        scene_path: str = DEFAULT_SCENE, baseline: dict = None, threshold: float = 0.2) -> dict:
+    operations = list(operations or OPERATIONS)
+    blender = Blender(scene_path)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as workdir:
+        for shape in shapes:
+            for level in levels:
+                for operation in operations:
+                    result = run_case(blender, shape, level, operation, repeat, workdir)
+                    results.append(result)
+                    print(f"{shape:8s} level {level} {operation:28s} {result['vertices']:8d} verts "
+                          f"{result['seconds'] * 1000:10.2f} ms", file=sys.stderr)
+    blender.reset()
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "blender": bpy.app.version_string,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": results,
+        "complexity": complexity(results),
+    }
+    if baseline is not None:
+        report["comparison"] = compare(results, baseline, threshold)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Blender ラッパーの規模別ベンチマーク")
+    parser.add_argument("--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS), help="細分化レベル")
+    parser.add_argument("--shapes", nargs="+", default=list(SHAPES), choices=SHAPES)
+    parser.add_argument("--operations", nargs="+", choices=list(OPERATIONS), help="計測する操作（既定は全て）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scene", default=DEFAULT_SCENE)
+    parser.add_argument("--output", default="benchmark.json", help="結果の JSON を書き出すパス")
+    parser.add_argument("--baseline", help="比較する基準の JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="回帰とみなす遅くなりの割合")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = run(args.levels, args.shapes, args.operations, args.repeat, args.scene, baseline, args.threshold)
+
+    # レンダリング中の Blender の出力と混ざらないよう、結果はファイルに書き出す
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for shape, slopes in report["complexity"].items():
+        for operation, slope in slopes.items():
+            print(f"{shape:8s} {operation:28s} O(n^{slope:.2f})", file=sys.stderr)
+
+    regressions = [c for c in report.get("comparison", []) if c["regression"]]
+    for c in regressions:
+        print(f"REGRESSION {c['shape']} level {c['level']} {c['operation']}: "
+              f"{c['baseline_seconds'] * 1000:.2f} ms -> {c['seconds'] * 1000:.2f} ms ({c['ratio']:.2f}x)",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
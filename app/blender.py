@@ -3,7 +3,16 @@ import bmesh
 from PIL import Image, ImageFile
 import os, sys
 import math 
+import shutil
+import hashlib
+import tempfile
+import time
+import numpy as np
 from contextlib import contextmanager
+from render_cache import RenderCache
+from topology import MeshTopology
+from spatial import VertexIndex, ObjectBoundsIndex
+from mesh_export import export_arrays, CHUNK_SIZE
 
 
 @contextmanager
@@ -35,13 +44,121 @@ def stdout_redirected(to=os.devnull):
             # buffering and flags such as
             # CLOEXEC may be different
 
+#レンダリングプロファイル（scene_settings に渡す設定）
+RENDER_PROFILES = {
+    # 形状確認用。GPU の無い環境では Workbench / EEVEE より低サンプルの Cycles の方が速い
+    "preview": {
+        "render.engine": "CYCLES",
+        "render.resolution_percentage": 50,
+        "cycles.samples": 16,
+        "cycles.use_denoising": False,
+        "cycles.max_bounces": 2,
+    },
+    # GPU のある環境向けの形状確認用
+    "workbench": {
+        "render.engine": "BLENDER_WORKBENCH",
+        "render.resolution_percentage": 50,
+        "display.render_aa": "FXAA",
+    },
+    # .blend ファイルの設定そのまま
+    "final": {},
+}
+
+#get_face_normals で面を指定した場合、面の総数がこの倍数より多ければ一つずつ読む
+#（それより多くの面は全体を一括で読んで取り出す方が速い）
+FACE_NORMAL_READ_RATIO = 64
+
+#メッシュ編集セッション（オブジェクトごとに保持する BMesh）
+class _MeshSession:
+    def __init__(self, bm):
+        self.bm = bm
+        self.dirty = False
+        # 書き込み後、BMesh の面の法線がまだ再計算されていない
+        self.normals_dirty = False
+        self.depth = 0
+
+#reset() で削除対象とするデータブロックの種類
+_RESET_DATA_TYPES = (
+    "objects", "meshes", "materials", "cameras", "lights", "collections", "images", "actions",
+    "shape_keys", "node_groups", "textures", "curves", "worlds",
+)
+
+#reset() で元の値に戻すシーンの設定（シーンからの属性パス）
+_RESET_SCENE_SETTINGS = (
+    "render", "render.image_settings", "view_settings", "display_settings", "cycles", "eevee", "display",
+)
+
+#設定として記録・復元するプロパティの種類
+_SETTING_PROPERTY_TYPES = {"BOOLEAN", "INT", "FLOAT", "STRING", "ENUM"}
+
+#書き込み可能な設定プロパティの値を記録
+def _capture_properties(struct) -> dict:
+    values = {}
+    for prop in struct.bl_rna.properties:
+        if prop.is_readonly or prop.type not in _SETTING_PROPERTY_TYPES:
+            continue
+        value = getattr(struct, prop.identifier)
+        if getattr(prop, "is_array", False):
+            value = tuple(value)
+        elif isinstance(value, set):
+            value = set(value)
+        values[prop.identifier] = value
+    return values
+
+#ハッシュ用に値を順序の決まった表現にする（集合は並べ替え、配列はタプル、データブロックは名前）
+def _hashable_value(value):
+    if isinstance(value, set):
+        return tuple(sorted(value))
+    if isinstance(value, bpy.types.ID):
+        return value.name
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return tuple(value)
+    return value
+
+#書き込み可能な設定プロパティの値を名前順のタプルで取得（scene_hash 用）
+def _properties_digest(struct, exclude=()) -> tuple:
+    values = _capture_properties(struct)
+    return tuple((name, _hashable_value(values[name])) for name in sorted(values) if name not in exclude)
+
+#_capture_properties で記録した値に戻す（変わったものだけを書き込む）
+#file_format → color_depth のように他の値によって選べる値が変わる設定があるため、失敗したものは最後にもう一度試す
+def _restore_properties(struct, values: dict):
+    pending = []
+    for name, value in values.items():
+        current = getattr(struct, name)
+        if (tuple(current) if isinstance(value, tuple) else current) == value:
+            continue
+        pending.append((name, value))
+    for attempt in range(2):
+        failed = []
+        for name, value in pending:
+            try:
+                setattr(struct, name, value)
+            except (TypeError, ValueError, AttributeError, RuntimeError):
+                failed.append((name, value))
+        pending = failed
+
 class Blender: 
+    #最後に開いた .blend ファイルのスナップショット（bpy はプロセスで一つなのでクラスで共有）
+    _snapshot = None
+
 #基本操作
 
     #初期化、シーンを開く
-    def __init__(self, scenePath="/app/blank.blend"):
+    #同じファイルを開いた直後の状態がスナップショットにあれば、読み込み直さずに reset() で戻す
+    def __init__(self, scenePath="/app/blank.blend", reuse: bool = True):
         self.scenePath = scenePath
-        self.open_scene(scenePath)
+        self._mesh_sessions = {}
+        self._topologies = {}
+        self._vertex_indices = {}
+        self._object_index = None
+        self._render_cache = None
+        self._render_costs = {}
+        if reuse and self._can_reset_to(scenePath):
+            self._bind_scene()
+            self.reset()
+        else:
+            self.open_scene(scenePath)
 
     #モード切り替え
     def set_mode(self, mode):
@@ -49,25 +166,576 @@ class Blender:
 
     #.blendファイルを開く
     def open_scene(self, scenePath):
+        self._discard_mesh_sessions()
         bpy.ops.wm.open_mainfile(filepath=scenePath)
+        self._bind_scene()
+        Blender._snapshot = self._take_snapshot(scenePath)
+
+    def _bind_scene(self):
+        self._cube_template = None
+        self._topologies.clear()
+        self.invalidate_spatial_index()
         self.context = bpy.context
         self.scene = self.context.scene
         self.camera = self.scene.camera
 
+    #シーンをファイルを開いた直後の状態に戻す（ファイルは読み込み直さない）
+    #スナップショット以降に作られたオブジェクト・メッシュなどのデータブロックは削除し、
+    #オブジェクトの変換・表示・メッシュ、カメラとライトのデータ、レンダー・色管理の設定、フレーム範囲を元に戻す
+    #それ以外（マテリアルやワールドなど）をその場で変更した場合は reuse=False で開き直すこと
+    def reset(self):
+        snapshot = Blender._snapshot
+        if not self._can_reset_to(snapshot["path"]):
+            self.open_scene(snapshot["path"])
+            return
+        self._discard_mesh_sessions()
+
+        removed = []
+        for data_type, pointers in snapshot["ids"].items():
+            removed.extend(id for id in getattr(bpy.data, data_type) if id.as_pointer() not in pointers)
+        bpy.data.batch_remove(removed)
+
+        for obj, state in snapshot["objects"]:
+            obj.location, obj.rotation_euler, obj.scale = state["transform"]
+            obj.hide_render, obj.hide_viewport = state["hide"]
+            if obj.data != state["data"]:
+                obj.data = state["data"]
+            if state["mesh"] is not None:
+                # 頂点編集などで変更されたメッシュを元に戻す
+                bm = bmesh.new()
+                bm.from_mesh(state["mesh"])
+                bm.to_mesh(obj.data)
+                bm.free()
+            if not state["animated"]:
+                obj.animation_data_clear()
+
+        for id, values in snapshot["data_settings"]:
+            _restore_properties(id, values)
+        for path, values in snapshot["scene_settings"].items():
+            _restore_properties(self._get_scene_setting(path), values)
+        self.scene.camera = snapshot["camera"]
+
+        self.scene.frame_start, self.scene.frame_end, self.scene.frame_current = snapshot["frames"]
+        self._bind_scene()
+        self.context.view_layer.update()
+
+    #同じファイルのスナップショットがあり、現在のシーンがそのファイルのものか
+    #ファイルが書き換えられている場合や、元のファイルにあったデータブロックが削除されている場合は開き直す
+    def _can_reset_to(self, scenePath: str) -> bool:
+        snapshot = Blender._snapshot
+        if (
+            snapshot is None
+            or snapshot["path"] != os.path.abspath(scenePath)
+            or snapshot["file"] != self._file_signature(scenePath)
+            or bpy.context.scene is None
+            or bpy.context.scene.as_pointer() != snapshot["scene"]
+        ):
+            return False
+        return all(
+            pointers <= {id.as_pointer() for id in getattr(bpy.data, data_type)}
+            for data_type, pointers in snapshot["ids"].items()
+        )
+
+    #ファイルの更新時刻とサイズ
+    def _file_signature(self, scenePath: str) -> tuple:
+        try:
+            stat = os.stat(scenePath)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    #開いた直後のデータブロックとオブジェクトの状態を記録
+    def _take_snapshot(self, scenePath: str) -> dict:
+        objects = []
+        for obj in bpy.data.objects:
+            mesh = None
+            if obj.type == 'MESH':
+                # 元のメッシュの複製（ユーザー 0 なので .blend には保存されない）
+                mesh = obj.data.copy()
+            objects.append((obj, {
+                "transform": (obj.location.copy(), obj.rotation_euler.copy(), obj.scale.copy()),
+                "hide": (obj.hide_render, obj.hide_viewport),
+                "data": obj.data,
+                "mesh": mesh,
+                "animated": obj.animation_data is not None,
+            }))
+
+        data_settings = [(id, _capture_properties(id)) for id in list(bpy.data.cameras) + list(bpy.data.lights)]
+
+        return {
+            "path": os.path.abspath(scenePath),
+            "file": self._file_signature(scenePath),
+            "scene": bpy.context.scene.as_pointer(),
+            "camera": self.scene.camera,
+            "data_settings": data_settings,
+            "scene_settings": {path: _capture_properties(self._get_scene_setting(path))
+                               for path in _RESET_SCENE_SETTINGS},
+            "ids": {data_type: {id.as_pointer() for id in getattr(bpy.data, data_type)}
+                    for data_type in _RESET_DATA_TYPES},
+            "objects": objects,
+            "frames": (self.scene.frame_start, self.scene.frame_end, self.scene.frame_current),
+        }
+
     #.blendファイルを保存
     def save_scene(self, scenePath="/app/result.blend"):
+        self.flush_mesh_sessions()
         bpy.ops.wm.save_as_mainfile(filepath=scenePath)
 
+    #オブジェクトのメッシュを三角形分割して .ply / .stl / .glb / .npz へ書き出す（エクスポートオペレーターは使わない）
+    #world_space=True の場合はオブジェクトの変換を適用した座標で書き出す
+    def export_mesh(self, object_name: str, path: str, world_space: bool = True, chunk_size: int = CHUNK_SIZE) -> str:
+        co = self.get_vertex_array(object_name)
+        if world_space:
+            self.context.view_layer.update()
+            matrix = np.array(self.get_object(object_name).matrix_world, dtype=np.float32)
+            co = co @ matrix[:3, :3].T + matrix[:3, 3]
+        return export_arrays(path, co, self.get_triangle_array(object_name), chunk_size)
+
+    #現在のシーンを別ファイルへ複製保存（開いているファイルは切り替えない）
+    def save_scene_copy(self, scenePath: str) -> str:
+        self.flush_mesh_sessions()
+        bpy.ops.wm.save_as_mainfile(filepath=scenePath, copy=True)
+        return scenePath
+
     #レンダリング実行
-    def render(self, outputPath="output.png") -> ImageFile:
+    #settings はシーンからの属性パスと値の辞書（例: {"render.resolution_x": 640, "cycles.samples": 16}）
+    #レンダリングキャッシュが有効な場合、シーンが変わっていなければ前回の画像を再利用する
+    #profile は RENDER_PROFILES の名前、time_budget は目安の所要時間（秒）
+    def render(self, outputPath="output.png", settings: dict = None, use_cache: bool = True,
+               profile: str = None, time_budget: float = None) -> ImageFile:
+        self.flush_mesh_sessions()
         pastLocation = tuple([a for a in self.camera.location])
         self.scene.render.filepath = outputPath
 
-        with stdout_redirected():
-            bpy.ops.render.render(write_still=True)
+        with self._render_setup(settings, profile, time_budget):
+            key, cached = None, None
+            if use_cache and self._render_cache is not None:
+                key = self.scene_hash()
+                ext = self.scene.render.file_extension
+                cached = self._render_cache.get(key, ext)
+
+            if cached is not None:
+                shutil.copyfile(cached, outputPath)
+            else:
+                self._timed_render(write_still=True)
+                if key is not None:
+                    self._render_cache.put(key, outputPath, ext)
+        self.camera.location = pastLocation
+
+        # 読み込みを済ませてファイルを閉じておく
+        image = Image.open(outputPath)
+        image.load()
+        return image
+
+    #レンダリング結果を (H, W, 4) の ndarray で取得（outputPath を指定した場合のみファイルにも保存）
+    #dtype=np.uint8 は PNG と同じビュー変換後の色、np.float32 はビュー変換前のリニアな値
+    def render_to_array(self, outputPath: str = None, dtype=np.uint8, settings: dict = None,
+                        profile: str = None, time_budget: float = None) -> np.ndarray:
+        self.flush_mesh_sessions()
+        pastLocation = tuple([a for a in self.camera.location])
+
+        with self._render_setup(settings, profile, time_budget):
+            self._timed_render()
+            result = bpy.data.images["Render Result"]
+            if outputPath is not None:
+                result.save_render(outputPath, scene=self.scene)
+            pixels = self._render_result_pixels(result, dtype)
+        self.camera.location = pastLocation
+        return pixels
+
+    #Render Result の画素を読み出す
+    #バックグラウンド実行ではコンポジターのビューアーノードが更新されず Render Result も画素を持たないため、
+    #圧縮なしの一時ファイル（可能ならメモリ上の /dev/shm）を経由する
+    def _render_result_pixels(self, result, dtype) -> np.ndarray:
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            if np.dtype(dtype) == np.uint8:
+                path = os.path.join(tmp, "result.tif")
+                with self.scene_settings({"render.image_settings.file_format": "TIFF",
+                                          "render.image_settings.color_mode": "RGBA",
+                                          "render.image_settings.color_depth": "8",
+                                          "render.image_settings.tiff_codec": "NONE"}):
+                    result.save_render(path, scene=self.scene)
+                with Image.open(path) as image:
+                    return np.array(image)
+
+            path = os.path.join(tmp, "result.exr")
+            with self.scene_settings({"render.image_settings.file_format": "OPEN_EXR",
+                                      "render.image_settings.color_mode": "RGBA",
+                                      "render.image_settings.color_depth": "32",
+                                      "render.image_settings.exr_codec": "NONE"}):
+                result.save_render(path, scene=self.scene)
+            image = bpy.data.images.load(path)
+            try:
+                width, height = image.size
+                pixels = np.empty(width * height * 4, dtype=np.float32)
+                image.pixels.foreach_get(pixels)
+            finally:
+                bpy.data.images.remove(image)
+        # Blender の画素は下の行から並んでいる
+        return pixels.reshape(height, width, 4)[::-1].astype(dtype)
+
+    #プロファイル、個別設定、時間予算をまとめて適用（個別設定がプロファイルより優先）
+    @contextmanager
+    def _render_setup(self, settings: dict = None, profile: str = None, time_budget: float = None):
+        merged = dict(RENDER_PROFILES[profile]) if profile is not None else {}
+        merged.update(settings or {})
+        with self.scene_settings(merged):
+            with self.scene_settings(self._budget_settings(time_budget)):
+                yield
+
+    #フレーム範囲を順にレンダリング
+    #output_pattern は "#" をフレーム番号に置き換えるパス（例: "/app/frames/frame_####.png"）
+    #output_pattern=None の場合はファイルに書かず、各フレームを (H, W, 4) の uint8 配列で callback に渡す
+    #callback(frame, result) の result はファイルのパスまたは配列
+    #エンジンのデータはフレーム間で保持し（use_persistent_data）、画像の読み込み直しもしない
+    #skip_unchanged=True の場合、評価後のシーンが前のフレームと同じならレンダリングせず前の結果を使う
+    #戻り値: 実際にレンダリングしたフレーム番号のリスト
+    def render_animation(self, frame_start: int, frame_end: int, output_pattern: str = None, callback=None,
+                         skip_unchanged: bool = True, frame_step: int = 1, settings: dict = None,
+                         profile: str = None, use_cache: bool = True) -> list[int]:
+        self.flush_mesh_sessions()
+        pastLocation = tuple([a for a in self.camera.location])
+        pastFrame = self.scene.frame_current
+        pastFilepath = self.scene.render.filepath
+
+        rendered = []
+        animation_settings = {"render.use_persistent_data": True}
+        animation_settings.update(settings or {})
+        with self._render_setup(animation_settings, profile):
+            previous_key, previous = None, None
+            ext = self.scene.render.file_extension
+            cache = self._render_cache if use_cache and output_pattern is not None else None
+            for frame in range(frame_start, frame_end + 1, frame_step):
+                self.scene.frame_set(frame)
+                key = self.scene_hash() if skip_unchanged or cache is not None else None
+
+                if output_pattern is None:
+                    if not (skip_unchanged and key == previous_key):
+                        self._timed_render()
+                        previous = self._render_result_pixels(bpy.data.images["Render Result"], np.uint8)
+                        rendered.append(frame)
+                else:
+                    self.scene.render.filepath = output_pattern
+                    path = self.scene.render.frame_path(frame=frame)
+                    cached = cache.get(key, ext) if cache is not None else None
+                    if skip_unchanged and key == previous_key:
+                        shutil.copyfile(previous, path)
+                    elif cached is not None:
+                        shutil.copyfile(cached, path)
+                    else:
+                        self.scene.render.filepath = path
+                        self._timed_render(write_still=True)
+                        rendered.append(frame)
+                        if cache is not None:
+                            cache.put(key, path, ext)
+                    previous = path
+
+                previous_key = key
+                if callback is not None:
+                    callback(frame, previous)
+
+        self.scene.render.filepath = pastFilepath
+        self.scene.frame_set(pastFrame)
         self.camera.location = pastLocation
-        return Image.open(outputPath)
+        return rendered
+
+    #レンダリングを実行し、エンジンごとの 1 画素 1 サンプルあたりの所要時間を記録
+    def _timed_render(self, **kwargs):
+        start = time.perf_counter()
+        with stdout_redirected():
+            bpy.ops.render.render(**kwargs)
+        elapsed = time.perf_counter() - start
+        pixels, samples = self._render_workload()
+        self._render_costs[self.scene.render.engine] = elapsed / (pixels * samples)
+
+    #現在の設定での画素数とサンプル数
+    def _render_workload(self) -> tuple[float, int]:
+        render = self.scene.render
+        scale = render.resolution_percentage / 100
+        pixels = render.resolution_x * render.resolution_y * scale * scale
+        path = self._samples_setting()
+        samples = self._get_scene_setting(path) if path is not None else 1
+        return pixels, samples
+
+    #エンジンごとのサンプル数の設定
+    def _samples_setting(self) -> str:
+        engine = self.scene.render.engine
+        if engine == "CYCLES":
+            return "cycles.samples"
+        if engine.startswith("BLENDER_EEVEE"):
+            return "eevee.taa_render_samples"
+        return None
+
+    def _get_scene_setting(self, path: str):
+        target = self.scene
+        for name in path.split("."):
+            target = getattr(target, name)
+        return target
+
+    #時間予算に収まるようにサンプル数と解像度を下げる設定
+    #過去の同じエンジンでのレンダリング時間から見積もり、超過分はサンプル数と画素数で半分ずつ削る
+    def _budget_settings(self, time_budget: float = None) -> dict:
+        if time_budget is None:
+            return {}
+        settings = {}
+        engine = self.scene.render.engine
+        samples_path = self._samples_setting()
+        if engine == "CYCLES":
+            # Cycles はサンプリング自体も時間で打ち切れる
+            settings["cycles.time_limit"] = time_budget
+
+        cost = self._render_costs.get(engine)
+        if cost is None:
+            return settings
+        pixels, samples = self._render_workload()
+        scale = time_budget / (cost * pixels * samples)
+        if scale >= 1.0:
+            return settings
+
+        if samples_path is not None:
+            new_samples = max(1, int(samples * math.sqrt(scale)))
+            settings[samples_path] = new_samples
+            scale /= new_samples / samples
+        # 画素数は解像度の 2 乗に比例する
+        percentage = self.scene.render.resolution_percentage
+        settings["render.resolution_percentage"] = max(1, int(percentage * math.sqrt(scale)))
+        return settings
+
+    #レンダリングキャッシュを有効化
+    def enable_render_cache(self, cache_dir: str = "/app/.render_cache", max_bytes: int = 512 * 1024 * 1024):
+        self._render_cache = RenderCache(cache_dir, max_bytes)
+
+    #レンダリングキャッシュを無効化
+    def disable_render_cache(self):
+        self._render_cache = None
+
+    #レンダリング結果に影響するシーンの状態のハッシュ値
+    #メッシュ、変換、カメラ・ライトのデータ、マテリアルとワールド（ノードの設定・入力値・リンク）、
+    #_RESET_SCENE_SETTINGS の全ての設定を含む
+    #画像テクスチャはファイルパスだけを含むため、同じパスの画像ファイルを書き換えた場合はキャッシュを無効化すること
+    def scene_hash(self) -> str:
+        self.flush_mesh_sessions()
+        depsgraph = self.context.evaluated_depsgraph_get()
+        h = hashlib.sha1()
+
+        def update(*values):
+            h.update(repr(values).encode())
+
+        materials = {}
+        for obj in sorted(self.scene.objects, key=lambda o: o.name):
+            if obj.hide_render:
+                continue
+            obj_eval = obj.evaluated_get(depsgraph)
+            update(obj.name, obj.type)
+            h.update(np.array(obj_eval.matrix_world, dtype=np.float32).tobytes())
+
+            if obj.type == 'MESH':
+                # モディファイアやシェイプキーを適用した後のメッシュ
+                mesh = obj_eval.data
+                for collection, attr, dtype, width in (
+                    (mesh.vertices, "co", np.float32, 3),
+                    (mesh.polygons, "loop_total", np.int32, 1),
+                    (mesh.loops, "vertex_index", np.int32, 1),
+                ):
+                    array = np.empty(len(collection) * width, dtype=dtype)
+                    collection.foreach_get(attr, array)
+                    h.update(array.tobytes())
+                update([slot.material.name if slot.material else None for slot in obj.material_slots])
+                for slot in obj.material_slots:
+                    if slot.material is not None:
+                        materials[slot.material.name] = slot.material
+            elif obj.type in ('CAMERA', 'LIGHT'):
+                update(_properties_digest(obj.data))
+
+        for name in sorted(materials):
+            update(name, _properties_digest(materials[name]))
+            self._hash_node_tree(update, materials[name].node_tree, set())
+        world = self.scene.world
+        if world is not None:
+            update(world.name, _properties_digest(world))
+            self._hash_node_tree(update, world.node_tree, set())
+
+        update(self.scene.camera.name if self.scene.camera else None)
+        for path in _RESET_SCENE_SETTINGS:
+            # 出力先のパスは画像の内容に影響しない
+            update(path, _properties_digest(self._get_scene_setting(path), exclude=("filepath",)))
+        return h.hexdigest()
+
+    #ノードツリーの状態（ノードの設定、入力ソケットの値、リンク）を update に渡す
+    #グループノードの中のツリーも含め、seen は同じツリーを二度数えないためのポインタの集合
+    def _hash_node_tree(self, update, tree, seen: set):
+        if tree is None or tree.as_pointer() in seen:
+            return
+        seen.add(tree.as_pointer())
+        for node in sorted(tree.nodes, key=lambda n: n.name):
+            update(node.name, node.bl_idname, _properties_digest(node))
+            image = getattr(node, "image", None)
+            if image is not None:
+                update(image.name, image.filepath, image.source)
+            for socket in node.inputs:
+                update(socket.identifier, socket.is_linked, _hashable_value(getattr(socket, "default_value", None)))
+            self._hash_node_tree(update, getattr(node, "node_tree", None), seen)
+        update(sorted((link.from_node.name, link.from_socket.identifier, link.to_node.name,
+                       link.to_socket.identifier, link.is_muted) for link in tree.links))
+
+    #シーンの設定を一時的に変更し、終了時に元へ戻す
+    @contextmanager
+    def scene_settings(self, settings: dict = None):
+        # 変更前の値を先に全て記録しておく
+        # （file_format → color_depth のように、先の値が後の値の選択肢を決める設定があるため）
+        entries = []
+        for path, value in (settings or {}).items():
+            owner, _, attr = ("scene." + path).rpartition(".")
+            target = self.scene
+            for name in owner.split(".")[1:]:
+                target = getattr(target, name)
+            entries.append((target, attr, getattr(target, attr), value))
+
+        applied = []
+        try:
+            for target, attr, past, value in entries:
+                setattr(target, attr, value)
+                applied.append((target, attr, past))
+            yield
+        finally:
+            # 設定した順に元の値へ戻す
+            for target, attr, past in applied:
+                setattr(target, attr, past)
     
+#=============================================================================================   
+#メッシュ編集セッション
+
+    #BMesh を保持したまま複数の頂点操作を行い、終了時に一度だけメッシュへ書き戻す
+    #  with blender.mesh_session(name):
+    #      for i in range(blender.count_vertex(name)):
+    #          x, y, z = blender.locate_vertex(name, i)
+    #          blender.move_vertex(name, i, x, y, z + 1)
+    @contextmanager
+    def mesh_session(self, object_name: str):
+        session = self._mesh_sessions.get(object_name)
+        if session is None:
+            bm = bmesh.new()
+            bm.from_mesh(self.get_object(object_name).data)
+            session = _MeshSession(bm)
+            self._mesh_sessions[object_name] = session
+        session.depth += 1
+        try:
+            yield session.bm
+        finally:
+            session.depth -= 1
+            # 入れ子の場合は一番外側のセッション終了時にのみ書き戻す
+            # reset() や open_scene() で破棄されたセッションは書き戻さない（BMesh も解放済み）
+            if session.depth == 0 and self._mesh_sessions.get(object_name) is session:
+                self._mesh_sessions.pop(object_name, None)
+                self._write_mesh_session(object_name, session)
+                session.bm.free()
+
+    #開いているセッションの変更をメッシュへ書き戻す（セッションは継続）
+    def flush_mesh_sessions(self, object_name: str = None):
+        if object_name is None:
+            names = list(self._mesh_sessions)
+        else:
+            names = [object_name] if object_name in self._mesh_sessions else []
+        for name in names:
+            self._write_mesh_session(name, self._mesh_sessions[name])
+
+    #メッシュ側が変更されたとき、セッションの BMesh を読み直す
+    def _reload_mesh_session(self, object_name: str):
+        session = self._mesh_sessions.get(object_name)
+        if session is None:
+            return
+        session.bm.clear()
+        session.bm.from_mesh(self.get_object(object_name).data)
+        session.dirty = False
+        session.normals_dirty = False
+
+    def _write_mesh_session(self, object_name: str, session: _MeshSession):
+        # 削除済みのオブジェクトには書き戻さない
+        obj = bpy.data.objects.get(object_name)
+        if session.dirty and obj is not None:
+            self._ensure_single_user(object_name)
+            session.bm.to_mesh(obj.data)
+            obj.data.update()
+            self.invalidate_spatial_index(object_name)
+        session.dirty = False
+
+    #シーンを開き直す前に、書き戻さずにセッションを破棄
+    def _discard_mesh_sessions(self):
+        for session in self._mesh_sessions.values():
+            session.bm.free()
+        self._mesh_sessions.clear()
+
+    #セッション中ならその BMesh を、そうでなければ一時的な BMesh を返す
+    #write=True の場合は変更をメッシュへ反映する（セッション中は dirty にするだけ）
+    #normals=True の場合、セッション中の書き込みの後なら面の法線を再計算してから返す
+    @contextmanager
+    def _bmesh(self, object_name: str, write: bool = False, normals: bool = False):
+        session = self._mesh_sessions.get(object_name)
+        if session is not None:
+            bm = session.bm
+            if normals and session.normals_dirty:
+                bm.normal_update()
+                session.normals_dirty = False
+            bm.verts.ensure_lookup_table()
+            bm.edges.ensure_lookup_table()
+            bm.faces.ensure_lookup_table()
+            yield bm
+            if write:
+                session.dirty = True
+                session.normals_dirty = True
+            return
+
+        mesh = self.get_object(object_name).data
+        bm = bmesh.new()
+        try:
+            bm.from_mesh(mesh)
+            bm.verts.ensure_lookup_table()
+            bm.edges.ensure_lookup_table()
+            bm.faces.ensure_lookup_table()
+            yield bm
+            if write:
+                self._ensure_single_user(object_name)
+                bm.to_mesh(self.get_object(object_name).data)
+                self.invalidate_spatial_index(object_name)
+        finally:
+            bm.free()
+
+    #トポロジー変更後にインデックスと参照テーブルを更新
+    def _refresh_bmesh(self, bm):
+        bm.verts.index_update()
+        bm.edges.index_update()
+        bm.faces.index_update()
+        bm.verts.ensure_lookup_table()
+        bm.edges.ensure_lookup_table()
+        bm.faces.ensure_lookup_table()
+
+    #オブジェクトごとの隣接関係の索引（トポロジーが変わるまで使い回す）
+    def get_topology(self, object_name: str) -> MeshTopology:
+        self.flush_mesh_sessions(object_name)
+        mesh = self.get_object(object_name).data
+        topology = self._topologies.get(object_name)
+        if topology is None or not topology.matches(mesh):
+            topology = MeshTopology(mesh)
+            self._topologies[object_name] = topology
+        return topology
+
+    #トポロジーを変更する操作の後で索引を破棄
+    def _invalidate_topology(self, *object_names: str):
+        for object_name in object_names:
+            self._topologies.pop(object_name, None)
+        self.invalidate_spatial_index(*object_names)
+
+    #頂点座標やオブジェクトの変換を変更する操作の後で空間索引を破棄
+    #名前を指定しない場合は全て破棄（bpy を直接操作した後に呼ぶ）
+    def invalidate_spatial_index(self, *object_names: str):
+        if not object_names:
+            self._vertex_indices.clear()
+        for object_name in object_names:
+            self._vertex_indices.pop((object_name, False), None)
+            self._vertex_indices.pop((object_name, True), None)
+        self._object_index = None
+
 #=============================================================================================   
 #オブジェクト情報取得
 
@@ -89,19 +757,66 @@ class Blender:
 
     #立方体を追加
     def add_cube(self, x, y, z) -> str:
-        past = self.all_objects()
         bpy.ops.mesh.primitive_cube_add(location=(x, y, z))
-        for object in self.all_objects():
-            if object not in past:
-                return object.name
+        self._object_index = None
+        # 追加されたオブジェクトはアクティブになる
+        return self.context.view_layer.objects.active.name
+
+    #立方体をオペレーターを使わずにまとめて追加
+    #scales はスカラー（全体共通）、(N,)（個別の均一スケール）、(N, 3) のいずれか
+    #shared=True の場合は全オブジェクトで一つのメッシュを共有し、頂点編集時に複製する
+    def add_cubes(self, positions, scales=None, shared: bool = False) -> list[str]:
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        if scales is not None:
+            scales = np.asarray(scales, dtype=float)
+            if scales.ndim < 2:
+                scales = scales.reshape(-1, 1)
+            scales = np.broadcast_to(scales, positions.shape)
+
+        template = self._get_cube_template()
+        collection = self.context.view_layer.active_layer_collection.collection
+        names = []
+        for i, position in enumerate(positions):
+            mesh = template if shared else template.copy()
+            obj = bpy.data.objects.new("Cube", mesh)
+            obj.location = position
+            if scales is not None:
+                obj.scale = scales[i]
+            collection.objects.link(obj)
+            names.append(obj.name)
+        self._object_index = None
+        return names
+
+    #add_cubes 用の立方体メッシュ（primitive_cube_add と同じ頂点順・UV）
+    #_cube_template は (メッシュ名, ポインタ)、他のインスタンスの reset() で削除されていれば作り直す
+    def _get_cube_template(self):
+        if self._cube_template is not None:
+            name, pointer = self._cube_template
+            mesh = bpy.data.meshes.get(name)
+            if mesh is not None and mesh.as_pointer() == pointer:
+                return mesh
+
+        mesh = bpy.data.meshes.new("Cube")
+        bm = bmesh.new()
+        bm.loops.layers.uv.new("UVMap")
+        bmesh.ops.create_cube(bm, size=2.0, calc_uvs=True)
+        bm.to_mesh(mesh)
+        bm.free()
+        self._cube_template = (mesh.name, mesh.as_pointer())
+        return mesh
+
+    #メッシュが共有されている場合、編集前にオブジェクト専用の複製に差し替える
+    def _ensure_single_user(self, object_name: str):
+        obj = self.get_object(object_name)
+        template = self._cube_template
+        if obj.data.users > 1 or (template is not None and obj.data.as_pointer() == template[1]):
+            obj.data = obj.data.copy()
 
     #スザンヌを追加
     def add_suzanne(self, x, y, z) -> str:
-        past = self.all_objects()
         bpy.ops.mesh.primitive_monkey_add(location=(x, y, z))
-        for object in self.all_objects():
-            if object not in past:
-                return object.name
+        self._object_index = None
+        return self.context.view_layer.objects.active.name
 
     #オブジェクトの絶対移動 
     def relative_move_object(self, object_name: str, x: float, y: float, z: float):
@@ -110,6 +825,7 @@ class Blender:
         obj.location.x += x
         obj.location.y += y
         obj.location.z += z
+        self.invalidate_spatial_index(object_name)
 
     #オブジェクトの相対移動
     def absolute_move_object(self, object_name: str, dx: float, dy: float, dz: float):
@@ -118,6 +834,7 @@ class Blender:
         obj.location.x = dx
         obj.location.y = dy
         obj.location.z = dz
+        self.invalidate_spatial_index(object_name)
 
     #オブジェクトのスケール変更
     def scale_object(self, object_name: str, scale_x: float, scale_y: float, scale_z: float):
@@ -125,19 +842,24 @@ class Blender:
         obj.scale.x = scale_x
         obj.scale.y = scale_y
         obj.scale.z = scale_z
+        self.invalidate_spatial_index(object_name)
 
     #オブジェクトの均一スケール変更
     def scale_object_uniform(self, object_name: str, scale: float):
         self.scale_object(object_name, scale, scale, scale)
     
-    #ブーリアン演算でオブジェクト統合
-    def boolean_union(self, base_name: str, target_name: str) -> str:
+    #ブーリアン演算でオブジェクト統合（solver は 'EXACT' / 'FAST' / 'MANIFOLD'）
+    def boolean_union(self, base_name: str, target_name: str, solver: str = "EXACT") -> str:
+        self.flush_mesh_sessions(base_name)
+        self.flush_mesh_sessions(target_name)
+        self._ensure_single_user(base_name)
         base_obj = self.get_object(base_name)
         target_obj = self.get_object(target_name)
         
         # ブーリアンモディファイアを追加
         modifier = base_obj.modifiers.new(name="Boolean", type='BOOLEAN')
         modifier.operation = 'UNION'
+        modifier.solver = solver
         modifier.object = target_obj
         
         # モディファイアを適用
@@ -146,158 +868,469 @@ class Blender:
         
         # ターゲットオブジェクトを削除
         bpy.data.objects.remove(target_obj, do_unlink=True)
+        self._invalidate_topology(base_name, target_name)
+        self._reload_mesh_session(base_name)
         
         return base_obj.name    
 
     #複数のオブジェクトをブーリアン統合
-    def boolean_union_multiple(self, base_name: str, object_names: list[str]) -> str:
-        result_name = base_name
-        
-        for target_name in object_names:
-            result_name = self.boolean_union(result_name, target_name)
-        
-        return result_name
+    #mode:
+    #  "SEQUENTIAL" 1 つずつ順に統合
+    #  "COLLECTION" コレクションを演算対象にして 1 回のモディファイア評価で統合
+    #  "TREE"       演算対象どうしを 2 つずつ統合していき、最後に base と統合
+    #skip_disjoint=True の場合、バウンディングボックスが他のどれとも重ならない
+    #オブジェクトはブーリアンを使わずメッシュを結合するだけにする
+    def boolean_union_multiple(self, base_name: str, object_names: list[str], mode: str = "SEQUENTIAL",
+                               solver: str = "EXACT", skip_disjoint: bool = False) -> str:
+        object_names = list(object_names)
+        if skip_disjoint and object_names:
+            disjoint = self._find_disjoint_objects(base_name, object_names)
+            self._join_meshes(base_name, [name for name, skip in zip(object_names, disjoint) if skip])
+            object_names = [name for name, skip in zip(object_names, disjoint) if not skip]
+
+        if not object_names:
+            return base_name
+
+        if mode == "SEQUENTIAL":
+            result_name = base_name
+            for target_name in object_names:
+                result_name = self.boolean_union(result_name, target_name, solver)
+            return result_name
+
+        if mode == "COLLECTION":
+            return self._boolean_union_collection(base_name, object_names, solver)
+
+        if mode == "TREE":
+            # 大きさの近いメッシュ同士を統合することで、巨大化した結果への繰り返し演算を避ける
+            names = object_names
+            while len(names) > 1:
+                merged = [self.boolean_union(a, b, solver) for a, b in zip(names[0::2], names[1::2])]
+                if len(names) % 2 == 1:
+                    merged.append(names[-1])
+                names = merged
+            return self.boolean_union(base_name, names[0], solver)
+
+        raise ValueError(f"unknown boolean union mode: {mode}")
+
+    #コレクションを演算対象として一度に統合
+    def _boolean_union_collection(self, base_name: str, object_names: list[str], solver: str) -> str:
+        self.flush_mesh_sessions()
+        self._ensure_single_user(base_name)
+        base_obj = self.get_object(base_name)
+        collection = bpy.data.collections.new("BooleanOperands")
+        for name in object_names:
+            collection.objects.link(self.get_object(name))
+
+        modifier = base_obj.modifiers.new(name="Boolean", type='BOOLEAN')
+        modifier.operation = 'UNION'
+        modifier.solver = solver
+        modifier.operand_type = 'COLLECTION'
+        modifier.collection = collection
+
+        bpy.context.view_layer.objects.active = base_obj
+        bpy.ops.object.modifier_apply(modifier=modifier.name)
+
+        for name in object_names:
+            bpy.data.objects.remove(self.get_object(name), do_unlink=True)
+        bpy.data.collections.remove(collection)
+        self._invalidate_topology(base_name, *object_names)
+        self._reload_mesh_session(base_name)
+
+        return base_obj.name
+
+    #ワールド座標でのバウンディングボックス (N, 3) の最小・最大
+    def _world_bounds(self, object_names: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        self.context.view_layer.update()
+        mins = np.empty((len(object_names), 3))
+        maxs = np.empty((len(object_names), 3))
+        for i, name in enumerate(object_names):
+            obj = self.get_object(name)
+            matrix = np.array(obj.matrix_world)
+            corners = np.array(obj.bound_box) @ matrix[:3, :3].T + matrix[:3, 3]
+            mins[i] = corners.min(axis=0)
+            maxs[i] = corners.max(axis=0)
+        return mins, maxs
+
+    #base と他のどのオブジェクトともバウンディングボックスが重ならないものを判定
+    def _find_disjoint_objects(self, base_name: str, object_names: list[str]) -> np.ndarray:
+        names = [base_name] + object_names
+        mins, maxs = self._world_bounds(names)
+        pairs = ObjectBoundsIndex(names, mins, maxs).overlap_pairs()
+        overlapping = np.zeros(len(names), dtype=bool)
+        overlapping[pairs.ravel()] = True
+        return ~overlapping[1:]
+
+    #ブーリアンを使わずに、オブジェクトのメッシュを base に結合して削除
+    def _join_meshes(self, base_name: str, object_names: list[str]):
+        if not object_names:
+            return
+        self.flush_mesh_sessions()
+        self.context.view_layer.update()
+        self._ensure_single_user(base_name)
+        base_obj = self.get_object(base_name)
+        inverse = base_obj.matrix_world.inverted()
+
+        bm = bmesh.new()
+        bm.from_mesh(base_obj.data)
+        for name in object_names:
+            obj = self.get_object(name)
+            count = len(bm.verts)
+            bm.from_mesh(obj.data)
+            bm.verts.ensure_lookup_table()
+            # base のローカル座標系へ変換
+            bmesh.ops.transform(bm, matrix=inverse @ obj.matrix_world, verts=bm.verts[count:])
+            bpy.data.objects.remove(obj, do_unlink=True)
+        bm.to_mesh(base_obj.data)
+        bm.free()
+        base_obj.data.update()
+        self._invalidate_topology(base_name, *object_names)
+        self._reload_mesh_session(base_name)
 
 #=============================================================================================   
 #メッシュ情報取得
 
     #頂点数を取得
     def count_vertex(self, object_name: str) -> int:
+        session = self._mesh_sessions.get(object_name)
+        if session is not None:
+            return len(session.bm.verts)
         vertices = self.get_object(object_name).data.vertices
         return len(vertices)
 
     #頂点座標取得
     def locate_vertex(self, object_name: str, vertex_index: int) -> tuple[float, float, float]:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
-        x, y, z = bm.verts[vertex_index].co
-        bm.free()
+        with self._bmesh(object_name) as bm:
+            x, y, z = bm.verts[vertex_index].co
         return x, y, z
     
+    #全頂点座標を (V, 3) の float32 配列で取得
+    def get_vertex_array(self, object_name: str) -> np.ndarray:
+        self.flush_mesh_sessions(object_name)
+        mesh = self.get_object(object_name).data
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        if len(co):
+            # position 属性からの一括読み込みは vertices の co より大幅に速い
+            mesh.attributes["position"].data.foreach_get("vector", co)
+        return co.reshape(-1, 3)
+    
     #頂点を共有する面のインデックスリストを取得
     def get_vertex_faces(self, object_name: str, vertex_index: int) -> list[int]:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
-        bm.faces.ensure_lookup_table()
-        
-        vertex = bm.verts[vertex_index]
-        face_indices = [face.index for face in vertex.link_faces]
-        
-        bm.free()
+        if object_name not in self._mesh_sessions:
+            return self.get_topology(object_name).vertex_faces(vertex_index).tolist()
+
+        with self._bmesh(object_name) as bm:
+            vertex = bm.verts[vertex_index]
+            face_indices = [face.index for face in vertex.link_faces]
         return face_indices
     
     #指定頂点において隣り合う面のペアを取得
     def get_adjacent_face_pairs(self, object_name: str, vertex_index: int) -> list[tuple[int, int]]:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
-        
-        vertex = bm.verts[vertex_index]
-        
-        # 頂点を共有するエッジを取得
-        edges = vertex.link_edges
-        
-        adjacent_pairs = []
-        for edge in edges:
-            # エッジを共有する面（最大2つ）を取得
-            faces = edge.link_faces
-            if len(faces) == 2:
-                adjacent_pairs.append((faces[0].index, faces[1].index))
+        if object_name not in self._mesh_sessions:
+            topology = self.get_topology(object_name)
+            adjacent_pairs = []
+            for edge_index in topology.vertex_edges(vertex_index):
+                faces = topology.faces_of_edge(edge_index)
+                if len(faces) == 2:
+                    adjacent_pairs.append((int(faces[0]), int(faces[1])))
+            return adjacent_pairs
+
+        with self._bmesh(object_name) as bm:
+            vertex = bm.verts[vertex_index]
+            
+            # 頂点を共有するエッジを取得
+            edges = vertex.link_edges
+            
+            adjacent_pairs = []
+            for edge in edges:
+                # エッジを共有する面（最大2つ）を取得
+                faces = edge.link_faces
+                if len(faces) == 2:
+                    adjacent_pairs.append((faces[0].index, faces[1].index))
         
-        bm.free()
         return adjacent_pairs
 
     #面の法線ベクトルを取得
     def get_face_normal(self, object_name: str, face_index: int) -> tuple[float, float, float]:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.faces.ensure_lookup_table()
-        
-        normal = bm.faces[face_index].normal
-        result = (normal.x, normal.y, normal.z)
-        
-        bm.free()
+        if object_name not in self._mesh_sessions:
+            x, y, z = self.get_object(object_name).data.polygons[face_index].normal
+            return x, y, z
+
+        with self._bmesh(object_name, normals=True) as bm:
+            normal = bm.faces[face_index].normal
+            result = (normal.x, normal.y, normal.z)
         return result
     
+    #頂点座標と面の構成をまとめて配列で取得（set_mesh_arrays で復元できる）
+    #co (V, 3)、loop_vert (L,) 各ループの頂点、loop_start / loop_total (F,) 各面のループの範囲
+    def get_mesh_arrays(self, object_name: str) -> dict[str, np.ndarray]:
+        topology = self.get_topology(object_name)
+        return {
+            "co": self.get_vertex_array(object_name),
+            "loop_vert": topology.loop_vert.copy(),
+            "loop_start": topology.loop_start.copy(),
+            "loop_total": topology.loop_total.copy(),
+        }
+
+    #三角形分割した面の頂点インデックスを (T, 3) の int32 配列で取得
+    def get_triangle_array(self, object_name: str) -> np.ndarray:
+        self.flush_mesh_sessions(object_name)
+        mesh = self.get_object(object_name).data
+        mesh.calc_loop_triangles()
+        triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", triangles)
+        return triangles.reshape(-1, 3)
+
+    #全面の法線ベクトルを (F, 3) の float32 配列で取得
+    #faces（インデックス列）を指定した場合はその面の法線だけを (N, 3) で取得
+    def get_face_normals(self, object_name: str, faces=None) -> np.ndarray:
+        self.flush_mesh_sessions(object_name)
+        polygons = self.get_object(object_name).data.polygons
+        if faces is not None and len(faces) * FACE_NORMAL_READ_RATIO < len(polygons):
+            # 少数の面は一つずつ読む
+            return np.array([polygons[i].normal for i in np.asarray(faces).tolist()],
+                            dtype=np.float32).reshape(-1, 3)
+
+        normals = np.empty(len(polygons) * 3, dtype=np.float32)
+        polygons.foreach_get("normal", normals)
+        normals = normals.reshape(-1, 3)
+        return normals if faces is None else normals[faces]
+
     #エッジ数を取得
     def count_edges(self, object_name: str) -> int:
+        session = self._mesh_sessions.get(object_name)
+        if session is not None:
+            return len(session.bm.edges)
         edges = self.get_object(object_name).data.edges
         return len(edges)
 
     #エッジの両端頂点取得
     def get_edge_vertices(self, object_name: str, edge_index: int):
-        mesh = self.get_object(object_name).data
-        edge = mesh.edges[edge_index]
-        v1_idx, v2_idx = edge.vertices[0], edge.vertices[1]
-        return v1_idx, v2_idx
+        if object_name in self._mesh_sessions:
+            with self._bmesh(object_name) as bm:
+                v1, v2 = bm.edges[edge_index].verts
+                return v1.index, v2.index
+        v1_idx, v2_idx = self.get_topology(object_name).edge_verts[edge_index]
+        return int(v1_idx), int(v2_idx)
 
     #指定頂点から隣接頂点へのエッジベクトルを取得
     def get_vertex_edge_vectors(self, object_name: str, vertex_index: int) -> list[tuple[float, float, float]]:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
-        
-        vertex = bm.verts[vertex_index]
-        edge_vectors = []
-        
-        # 頂点に接続する全エッジを取得
-        for edge in vertex.link_edges:
-            # エッジの両端の頂点を取得
-            v1, v2 = edge.verts
-            
-            # 現在の頂点から隣接頂点への方向ベクトル
-            if v1.index == vertex_index:
-                direction = v2.co - v1.co
-            else:
-                direction = v1.co - v2.co
+        if object_name not in self._mesh_sessions:
+            topology = self.get_topology(object_name)
+            vertices = self.get_object(object_name).data.vertices
+            origin = vertices[vertex_index].co
+            edge_vectors = []
+            for v1, v2 in topology.edge_verts[topology.vertex_edges(vertex_index)]:
+                # 現在の頂点から隣接頂点への方向ベクトル
+                other = v2 if v1 == vertex_index else v1
+                direction = vertices[other].co - origin
+                edge_vectors.append((direction.x, direction.y, direction.z))
+            return edge_vectors
+
+        with self._bmesh(object_name) as bm:
+            vertex = bm.verts[vertex_index]
+            edge_vectors = []
             
-            edge_vectors.append((direction.x, direction.y, direction.z))
+            # 頂点に接続する全エッジを取得
+            for edge in vertex.link_edges:
+                # エッジの両端の頂点を取得
+                v1, v2 = edge.verts
+                
+                # 現在の頂点から隣接頂点への方向ベクトル
+                if v1.index == vertex_index:
+                    direction = v2.co - v1.co
+                else:
+                    direction = v1.co - v2.co
+                
+                edge_vectors.append((direction.x, direction.y, direction.z))
         
-        bm.free()
         return edge_vectors
     
 #=============================================================================================   
 #メッシュ操作
 
-    #エッジ分割
+    #エッジ分割（戻り値はエッジの 1 番目の頂点に最も近い新しい頂点のインデックス）
     def subdivide_edge(self, object_name: str, edge_index: int, cuts=1) -> int:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.edges.ensure_lookup_table()
-        bmesh.ops.subdivide_edges(bm, edges=[bm.edges[edge_index]], cuts=cuts)
-        bm.to_mesh(mesh)
-        bm.free()
-        return self.count_vertex(object_name) - cuts
+        return int(self.subdivide_edges(object_name, [edge_index], cuts)[0, 0])
+
+    #複数のエッジを一度の bmesh.ops.subdivide_edges でまとめて分割
+    #edge_indices はインデックス列または (E,) の bool マスク
+    #戻り値: (N, cuts) の新しい頂点インデックス、各行はエッジの 1 番目の頂点側から 2 番目の頂点側への順
+    def subdivide_edges(self, object_name: str, edge_indices, cuts: int = 1) -> np.ndarray:
+        edge_indices = np.asarray(edge_indices)
+        if edge_indices.dtype == bool:
+            edge_indices = np.flatnonzero(edge_indices)
+
+        with self._bmesh(object_name, write=True) as bm:
+            edges = [bm.edges[int(i)] for i in edge_indices]
+            # 演算子の実行で既存の要素の Python 側の参照は無効になることがあるため、端点はインデックスで覚える
+            endpoints = [(edge.verts[0].index, edge.verts[1].index) for edge in edges]
+            result = bmesh.ops.subdivide_edges(bm, edges=edges, cuts=cuts)
+            self._refresh_bmesh(bm)
+            endpoints = [(bm.verts[a], bm.verts[b]) for a, b in endpoints]
+
+            split_verts = {elem for elem in result["geom_split"] if isinstance(elem, bmesh.types.BMVert)}
+            split_edges = {elem for elem in result["geom_split"] if isinstance(elem, bmesh.types.BMEdge)}
+            new_vertices = np.empty((len(endpoints), cuts), dtype=np.int64)
+            for row, (start, end) in enumerate(endpoints):
+                new_vertices[row] = [v.index for v in self._split_chain(start, end, split_verts, split_edges)]
+        self._invalidate_topology(object_name)
+        return new_vertices
+
+    #分割されたエッジの start から end までの間にできた頂点を順にたどる
+    #start に接続する分割後のエッジのうち、新しい頂点だけを通って end に着くものがそのエッジの分割結果
+    def _split_chain(self, start, end, split_verts: set, split_edges: set) -> list:
+        for edge in start.link_edges:
+            if edge not in split_edges:
+                continue
+            chain = []
+            previous, vertex = edge, edge.other_vert(start)
+            while vertex in split_verts:
+                chain.append(vertex)
+                following = [e for e in vertex.link_edges if e in split_edges and e != previous]
+                if len(following) != 1:
+                    break
+                previous = following[0]
+                vertex = previous.other_vert(vertex)
+            if vertex == end:
+                return chain
+        raise RuntimeError(f"could not find the split vertices between vertices {start.index} and {end.index}")
 
     #頂点の移動
     def move_vertex(self, object_name: str, vertex_index: int, x: float, y: float, z: float) -> None:
+        with self._bmesh(object_name, write=True) as bm:
+            bm.verts[vertex_index].co.x = x
+            bm.verts[vertex_index].co.y = y
+            bm.verts[vertex_index].co.z = z
+
+    #全頂点座標を (V, 3) の配列でまとめて設定
+    def set_vertex_array(self, object_name: str, coords: np.ndarray) -> None:
+        self.flush_mesh_sessions(object_name)
+        self._ensure_single_user(object_name)
         mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
-        bm.verts[vertex_index].co.x = x
-        bm.verts[vertex_index].co.y = y
-        bm.verts[vertex_index].co.z = z
-        bm.to_mesh(mesh)
-        bm.free()
+        co = np.ascontiguousarray(coords, dtype=np.float32).reshape(-1)
+        if len(co) != len(mesh.vertices) * 3:
+            raise ValueError(f"expected {len(mesh.vertices)} vertices, got {len(co) // 3}")
+        if len(co):
+            mesh.attributes["position"].data.foreach_set("vector", co)
+        mesh.update()
+        self.invalidate_spatial_index(object_name)
+        self._reload_mesh_session(object_name)
+
+    #get_mesh_arrays の配列でメッシュを置き換える
+    #面の構成が同じなら座標だけを書き込み、違う場合はメッシュを作り直す（UV などの属性は失われる）
+    def set_mesh_arrays(self, object_name: str, arrays: dict[str, np.ndarray]) -> None:
+        topology = self.get_topology(object_name)
+        loop_vert = np.asarray(arrays["loop_vert"], dtype=np.int32)
+        loop_total = np.asarray(arrays["loop_total"], dtype=np.int32)
+        co = np.asarray(arrays["co"], dtype=np.float32).reshape(-1, 3)
+        if (len(co) == topology.counts[0] and np.array_equal(loop_vert, topology.loop_vert)
+                and np.array_equal(loop_total, topology.loop_total)):
+            self.set_vertex_array(object_name, co)
+            return
+
+        self._ensure_single_user(object_name)
+        mesh = self.get_object(object_name).data
+        mesh.clear_geometry()
+        mesh.vertices.add(len(co))
+        mesh.vertices.foreach_set("co", co.ravel())
+        mesh.loops.add(len(loop_vert))
+        mesh.loops.foreach_set("vertex_index", loop_vert)
+        mesh.polygons.add(len(loop_total))
+        mesh.polygons.foreach_set("loop_start", np.asarray(arrays["loop_start"], dtype=np.int32))
+        mesh.update(calc_edges=True)
+        self._invalidate_topology(object_name)
+        self._reload_mesh_session(object_name)
+
+    #指定頂点をまとめて移動（indices はインデックス列または (V,) の bool マスク、offsets は (N, 3) または共通の (3,)）
+    def move_vertices(self, object_name: str, indices, offsets) -> None:
+        co = self.get_vertex_array(object_name)
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(np.int64, copy=False)
+        offsets = np.broadcast_to(np.asarray(offsets, dtype=np.float32), (len(indices), 3))
+        # 同じ頂点が複数回指定された場合も移動量を加算する
+        np.add.at(co, indices, offsets)
+        self.set_vertex_array(object_name, co)
 
     #頂点削除
     def delete_vertex(self, object_name: str, vertex_index: int,):
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
-        bmesh.ops.delete(bm, geom=[bm.verts[vertex_index]], context="VERTS")
-        bm.to_mesh(mesh)
-        bm.free()
+        self.delete_vertices(object_name, [vertex_index])
+
+    #複数の頂点を一度の bmesh.ops.delete でまとめて削除
+    #indices はインデックス列または (V,) の bool マスク
+    #戻り値: 削除前の頂点インデックス → 削除後のインデックスの (V,) 配列（削除された頂点は -1）
+    def delete_vertices(self, object_name: str, indices) -> np.ndarray:
+        vertex_count = self.count_vertex(object_name)
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            if len(indices) != vertex_count:
+                raise ValueError(f"expected a mask of {vertex_count} vertices, got {len(indices)}")
+            keep = ~indices
+        else:
+            keep = np.ones(vertex_count, dtype=bool)
+            keep[indices.astype(np.int64, copy=False)] = False
+
+        with self._bmesh(object_name, write=True) as bm:
+            verts = bm.verts
+            bmesh.ops.delete(bm, geom=[verts[int(i)] for i in np.flatnonzero(~keep)], context="VERTS")
+            self._refresh_bmesh(bm)
+        self._invalidate_topology(object_name)
+
+        # 残った頂点は元の順番のまま詰められる
+        return np.where(keep, np.cumsum(keep) - 1, -1)
+
+#=============================================================================================   
+#空間検索
+
+    #オブジェクトの頂点の KD 木（座標が変わるまで使い回す）
+    #world_space=True の場合はオブジェクトの変換を適用した座標で作る
+    def get_vertex_index(self, object_name: str, world_space: bool = False) -> VertexIndex:
+        # セッション中の変更を書き戻す（書き戻しで索引は破棄される）
+        self.flush_mesh_sessions(object_name)
+        matrix = None
+        if world_space:
+            self.context.view_layer.update()
+            matrix = tuple(map(tuple, self.get_object(object_name).matrix_world))
+
+        index = self._vertex_indices.get((object_name, world_space))
+        if index is None or index.matrix != matrix:
+            co = self.get_vertex_array(object_name)
+            if world_space:
+                m = np.array(matrix, dtype=np.float32)
+                co = co @ m[:3, :3].T + m[:3, 3]
+            index = VertexIndex(co, matrix)
+            self._vertex_indices[(object_name, world_space)] = index
+        return index
+
+    #各点 (N, 3) に最も近い k 個の頂点
+    #戻り値: (距離 (N, k), 頂点インデックス (N, k))
+    def find_nearest_vertices(self, object_name: str, points, k: int = 1,
+                              world_space: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        return self.get_vertex_index(object_name, world_space).nearest(points, k)
+
+    #点から radius 以内の頂点インデックス（近い順）
+    def find_vertices_in_radius(self, object_name: str, point: tuple[float, float, float], radius: float,
+                                world_space: bool = False) -> list[int]:
+        return self.get_vertex_index(object_name, world_space).within(point, radius).tolist()
+
+    #シーン内の全メッシュオブジェクトのバウンディングボックスの索引
+    #オブジェクトの追加・移動・メッシュ編集で破棄される
+    def get_object_index(self) -> ObjectBoundsIndex:
+        if self._object_index is None:
+            self.flush_mesh_sessions()
+            names = [obj.name for obj in self.scene.objects if obj.type == 'MESH']
+            mins, maxs = self._world_bounds(names)
+            self._object_index = ObjectBoundsIndex(names, mins, maxs)
+        return self._object_index
+
+    #バウンディングボックスが重なるオブジェクト名
+    #object_name の代わりに box=(最小, 最大) を指定すると、その箱と重なるオブジェクトを返す
+    def find_overlapping_objects(self, object_name: str = None, box: tuple = None) -> list[str]:
+        index = self.get_object_index()
+        if object_name is not None:
+            return index.overlapping_objects(object_name)
+        return [index.names[i] for i in index.overlapping(*box)]
 
 #=============================================================================================   
 #ビスマス骸晶用
@@ -309,36 +1342,78 @@ class Blender:
         angle_rad = math.acos(dot_product)
         angle_deg = math.degrees(angle_rad)
         return angle_rad
+
+    #二面角（法線の組 (N, 3) と (N, 3) からまとめて計算、符号なし）
+    #arccos は 0 付近の角度を分解できないため、float64 で外積の大きさと内積から求める
+    def calculate_dihedral_angles(self, normals1: np.ndarray, normals2: np.ndarray) -> np.ndarray:
+        normals1 = np.asarray(normals1, dtype=np.float64)
+        normals2 = np.asarray(normals2, dtype=np.float64)
+        dot_product = np.einsum("ij,ij->i", normals1, normals2)
+        return np.arctan2(np.linalg.norm(np.cross(normals1, normals2), axis=1), dot_product)
     
     #凸頂点の判定
     def is_convex_vertex(self, object_name: str, vertex_index: int) -> bool:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
-        
-        vertex = bm.verts[vertex_index]
-        
-        # すべてのエッジの二面角をチェック
-        is_convex = all(
-            edge.calc_face_angle_signed() > 0 
-            for edge in vertex.link_edges 
-            if len(edge.link_faces) == 2
-        )
+        with self._bmesh(object_name, normals=True) as bm:
+            vertex = bm.verts[vertex_index]
+            
+            # すべてのエッジの二面角をチェック
+            is_convex = all(
+                edge.calc_face_angle_signed() > 0 
+                for edge in vertex.link_edges 
+                if len(edge.link_faces) == 2
+            )
         
-        bm.free()
         return is_convex
 
     #すべての頂点から凸頂点を抽出
-    def get_convex_vertices(self, object_name: str) -> list[int]:
-        convex_vertices = []
+    def get_convex_vertices(self, object_name: str, tolerance: float = 0.0) -> list[int]:
+        return np.flatnonzero(self.get_convex_vertex_mask(object_name, tolerance)).tolist()
+
+    #全頂点の凸判定を (V,) の bool マスクで一括取得
+    #接続する全ての多様体エッジの符号付き二面角が tolerance より大きい頂点を凸とする
+    #vertices（インデックス列または bool マスク）を指定した場合はその頂点だけを判定し、それ以外は False
+    def get_convex_vertex_mask(self, object_name: str, tolerance: float = 0.0, vertices=None) -> np.ndarray:
         vertex_count = self.count_vertex(object_name)
-        
-        for vertex_idx in range(vertex_count):
-            if self.is_convex_vertex(object_name, vertex_idx):
-                convex_vertices.append(vertex_idx)
-        
-        return convex_vertices
+        if vertices is None:
+            mask = np.ones(vertex_count, dtype=bool)
+        else:
+            mask = np.zeros(vertex_count, dtype=bool)
+            mask[vertices] = True
+        edges, angles = self.get_dihedral_angles(object_name, vertices)
+        # 凹（または平坦）なエッジに接続する頂点を除外
+        edge_verts = self.get_topology(object_name).edge_verts[edges]
+        mask[edge_verts[angles <= tolerance].ravel()] = False
+        return mask
+
+    #面をちょうど 2 つ持つ全エッジの符号付き二面角を一括計算
+    #BMEdge.calc_face_angle_signed と同じく、凸なら正、凹なら負
+    #vertices（インデックス列または bool マスク）を指定した場合は、その頂点に接続するエッジだけを計算する
+    #戻り値: (エッジインデックス (M,), 二面角 (M,))
+    def get_dihedral_angles(self, object_name: str, vertices=None) -> tuple[np.ndarray, np.ndarray]:
+        topology = self.get_topology(object_name)
+        co = self.get_vertex_array(object_name)
+
+        # ちょうど 2 つのループ（面）を持つエッジ
+        if vertices is None:
+            edges, l1, l2 = topology.manifold_edges()
+            normals = self.get_face_normals(object_name).astype(np.float64)
+            n1, n2 = normals[topology.loop_face[l1]], normals[topology.loop_face[l2]]
+        else:
+            vertices = np.asarray(vertices)
+            if vertices.dtype == bool:
+                vertices = np.flatnonzero(vertices)
+            edges, l1, l2 = topology.manifold_edges(topology.edges_of_vertices(vertices))
+            # 法線はそのエッジの面の分だけ読む
+            faces, inverse = np.unique(topology.loop_face[np.concatenate([l1, l2])], return_inverse=True)
+            normals = self.get_face_normals(object_name, faces).astype(np.float64)[inverse]
+            n1, n2 = normals[:len(edges)], normals[len(edges):]
+        angles = self.calculate_dihedral_angles(n1, n2)
+
+        # ループの向きと法線の外積が同じ向きなら凸
+        loop_vert = topology.loop_vert
+        l_dir = co[loop_vert[topology.loop_next[l1]]].astype(np.float64) - co[loop_vert[l1]]
+        convex = np.einsum("ij,ij->i", l_dir, np.cross(n1, n2)) > 0
+        return edges, np.where(convex, angles, -angles)
 
     #ベクトルの長さを計算
     def vector_length(self, vector: tuple[float, float, float]) -> float:
@@ -347,51 +1422,59 @@ class Blender:
 
     #指定方向側の頂点を取得
     def get_vertices_in_direction(self, object_name: str, direction: tuple[float, float, float]) -> list[int]:
-        mesh = self.get_object(object_name).data
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bm.verts.ensure_lookup_table()
+        mask = self.get_vertices_in_directions(object_name, [direction])
+        return np.flatnonzero(mask[0]).tolist()
 
-        # オブジェクトの中心座標を計算
-        center_x = sum(v.co.x for v in bm.verts) / len(bm.verts)
-        center_y = sum(v.co.y for v in bm.verts) / len(bm.verts)
-        center_z = sum(v.co.z for v in bm.verts) / len(bm.verts)
+    #複数方向 (D, 3) それぞれの側にある頂点を (D, V) の bool マスクで一括取得
+    #world_space=True の場合はオブジェクトの変換を適用した座標・方向で判定する
+    #vertices（インデックス列または bool マスク）を指定した場合はその頂点だけを判定し、それ以外は False
+    def get_vertices_in_directions(self, object_name: str, directions, world_space: bool = False,
+                                   vertices=None) -> np.ndarray:
+        co = self.get_vertex_array(object_name)
+        directions = np.asarray(directions, dtype=np.float32).reshape(-1, 3)
 
-        direction_verts = []
-        dx, dy, dz = direction
+        if world_space:
+            self.context.view_layer.update()
+            matrix = np.array(self.get_object(object_name).matrix_world, dtype=np.float32)
+            co = co @ matrix[:3, :3].T + matrix[:3, 3]
 
-        for vert in bm.verts:
-            # 中心から頂点へのベクトル
-            to_vert_x = vert.co.x - center_x
-            to_vert_y = vert.co.y - center_y
-            to_vert_z = vert.co.z - center_z
-            
-            # 内積を計算、正なら成長方向側
-            dot_product = to_vert_x * dx + to_vert_y * dy + to_vert_z * dz
-            if dot_product > 0:
-                direction_verts.append(vert.index)
+        # 中心から頂点へのベクトルと各方向の内積、正なら成長方向側
+        center = co.mean(axis=0)
+        if vertices is None:
+            return (directions @ (co - center).T) > 0
 
-        bm.free()
-        return direction_verts
+        mask = np.zeros((len(directions), len(co)), dtype=bool)
+        mask[:, vertices] = (directions @ (co[vertices] - center).T) > 0
+        return mask
 
     #立方体をベクトル方向に伸長
     def stretch_cube_along_vector(self, object_name: str, vector: tuple[float, float, float], max_distance: float):
-        
-        # 成長方向側の頂点を取得
-        direction_verts = self.get_vertices_in_direction(object_name, vector)
-        
-        vx, vy, vz = vector
-        
+        co = self.get_vertex_array(object_name)
+        self._stretch_array(co, vector, max_distance)
+        self.set_vertex_array(object_name, co)
+
+    #複数オブジェクトをまとめて伸長 [(object_name, vector, max_distance), ...]
+    #同じオブジェクトへの複数指定は順に適用し、書き戻しはオブジェクトごとに一回
+    def stretch_objects(self, stretches: list[tuple[str, tuple[float, float, float], float]]):
+        grouped = {}
+        for object_name, vector, max_distance in stretches:
+            grouped.setdefault(object_name, []).append((vector, max_distance))
+
+        for object_name, items in grouped.items():
+            co = self.get_vertex_array(object_name)
+            for vector, max_distance in items:
+                self._stretch_array(co, vector, max_distance)
+            self.set_vertex_array(object_name, co)
+
+        # 依存グラフの更新は最後に一回だけ
+        self.context.view_layer.update()
+
+    #座標配列 (V, 3) のうち成長方向側の頂点をベクトル方向に max_distance だけ移動
+    def _stretch_array(self, co: np.ndarray, vector: tuple[float, float, float], max_distance: float):
+        direction = np.asarray(vector, dtype=np.float32)
         # 成長方向側の頂点のみを移動
-        for v_idx in direction_verts:
-            x, y, z = self.locate_vertex(object_name, v_idx)
-            
-            # ベクトル方向に max_distance だけ移動
-            new_x = x + vx * max_distance
-            new_y = y + vy * max_distance
-            new_z = z + vz * max_distance
-            
-            self.move_vertex(object_name, v_idx, new_x, new_y, new_z)
+        mask = (co - co.mean(axis=0)) @ direction > 0
+        co[mask] += direction * max_distance
 
 #=============================================================================================   
 #アニメーション
@@ -401,6 +1484,59 @@ class Blender:
         object = self.get_object(object_name)
         object.keyframe_insert(data_path="location", frame=frame_index)
 
+    #位置・回転・スケールのキーフレームを F カーブへ配列でまとめて書き込む
+    #frames は (N,)、location / rotation / scale は (N, 3) または全フレーム共通の (3,)（rotation はオイラー角、ラジアン）
+    #replace=True の場合は、書き込むチャンネルの既存のキーフレームを消してから書き込む
+    def insert_keyframes(self, object_name: str, frames, location=None, rotation=None, scale=None,
+                         interpolation: str = None, replace: bool = False):
+        obj = self.get_object(object_name)
+        frames = np.asarray(frames, dtype=np.float32).reshape(-1)
+        channels = {"location": location, "rotation_euler": rotation, "scale": scale}
+        for data_path, values in channels.items():
+            if values is None:
+                continue
+            values = np.broadcast_to(np.asarray(values, dtype=np.float32), (len(frames), 3))
+            for index in range(3):
+                fcurve = self._ensure_fcurve(obj, data_path, index)
+                self._write_fcurve(fcurve, frames, values[:, index], interpolation, replace)
+
+    #ID（オブジェクトやシェイプキー）のアニメーションの F カーブを取得、無ければ作成
+    def _ensure_fcurve(self, id, data_path: str, index: int = 0):
+        if id.animation_data is None:
+            id.animation_data_create()
+        action = id.animation_data.action
+        if action is None:
+            action = bpy.data.actions.new(f"{id.name}Action")
+            id.animation_data.action = action
+        # Blender 4.4 以降のスロット付きアクションでは、ID に割り当てられたスロットの F カーブを使う
+        if hasattr(action, "fcurve_ensure_for_datablock"):
+            return action.fcurve_ensure_for_datablock(id, data_path, index=index)
+        return action.fcurves.find(data_path, index=index) or action.fcurves.new(data_path, index=index)
+
+    #F カーブにキーフレーム (frames, values) を追加し、ハンドルの再計算は最後に一回だけ行う
+    def _write_fcurve(self, fcurve, frames: np.ndarray, values: np.ndarray, interpolation: str = None,
+                      replace: bool = False):
+        points = fcurve.keyframe_points
+        if replace:
+            points.clear()
+        start = len(points)
+        points.add(len(frames))
+
+        co = np.empty(len(points) * 2, dtype=np.float32)
+        points.foreach_get("co", co)
+        co[start * 2::2] = frames
+        co[start * 2 + 1::2] = values
+        points.foreach_set("co", co)
+
+        if interpolation is not None:
+            # foreach_set には列挙値の表示順ではなく値そのものを渡す
+            value = bpy.types.Keyframe.bl_rna.properties["interpolation"].enum_items[interpolation].value
+            modes = np.empty(len(points), dtype=np.int32)
+            points.foreach_get("interpolation", modes)
+            modes[start:] = value
+            points.foreach_set("interpolation", modes)
+        fcurve.update()
+
     #シェイプキー追加
     def add_shape_key(self, object_name: str):
         object = self.get_object(object_name)
@@ -411,4 +1547,61 @@ class Blender:
     def get_shape_keys(self, object_name: str):
         return self.get_object(object_name).data.shape_keys.key_blocks
 
+    #シェイプキーの座標を (V, 3) の配列でまとめて設定
+    #key_name のシェイプキーが無ければ作成する（シェイプキーが一つも無い場合は先に現在の形状から Basis を作る）
+    def set_shape_key_array(self, object_name: str, key_name: str, coords: np.ndarray) -> None:
+        self.flush_mesh_sessions(object_name)
+        self._ensure_single_user(object_name)
+        obj = self.get_object(object_name)
+        co = np.ascontiguousarray(coords, dtype=np.float32).reshape(-1)
+        if len(co) != len(obj.data.vertices) * 3:
+            raise ValueError(f"expected {len(obj.data.vertices)} vertices, got {len(co) // 3}")
+
+        if obj.data.shape_keys is None and key_name != "Basis":
+            obj.shape_key_add(name="Basis", from_mix=False)
+        key_block = obj.data.shape_keys.key_blocks.get(key_name) if obj.data.shape_keys else None
+        if key_block is None:
+            key_block = obj.shape_key_add(name=key_name, from_mix=False)
+        key_block.data.foreach_set("co", co)
+        obj.data.update()
+
+    #シェイプキーの座標を (V, 3) の float32 配列で取得
+    def get_shape_key_array(self, object_name: str, key_name: str) -> np.ndarray:
+        key_block = self.get_shape_keys(object_name)[key_name]
+        co = np.empty(len(key_block.data) * 3, dtype=np.float32)
+        key_block.data.foreach_get("co", co)
+        return co.reshape(-1, 3)
+
+    #シェイプキーの値のキーフレームを配列でまとめて書き込む
+    def insert_shape_key_keyframes(self, object_name: str, key_name: str, frames, values,
+                                   interpolation: str = "LINEAR", replace: bool = False):
+        key = self.get_object(object_name).data.shape_keys
+        fcurve = self._ensure_fcurve(key, f'key_blocks["{key_name}"].value')
+        self._write_fcurve(fcurve, np.asarray(frames, dtype=np.float32).reshape(-1),
+                           np.asarray(values, dtype=np.float32).reshape(-1), interpolation, replace)
+
+    #(K, V, 3) の座標列からシェイプキーを K 個まとめて作成
+    #k 番目のキーは frames[k] で値 1、前後のフレームで値 0 になるようにキーフレームを打つ
+    #（線形補間なので、隣り合うフレームの間では二つの形状の間を補間した形になる）
+    #最後のキーは frames[-1] 以降も値 1 のままにして、最後の形状を保つ
+    #frames を省略した場合は 1, 2, ..., K、names を省略した場合は prefix + 番号
+    def add_shape_key_stack(self, object_name: str, coords: np.ndarray, frames=None, names: list[str] = None,
+                            prefix: str = "step_") -> list[str]:
+        coords = np.asarray(coords, dtype=np.float32)
+        count = len(coords)
+        frames = np.arange(1, count + 1) if frames is None else np.asarray(frames).reshape(-1)
+        names = names or [f"{prefix}{i + 1}" for i in range(count)]
+
+        # 最初のキーの前は隣との間隔（一つだけなら 1）でフレームを補う
+        first_gap = frames[1] - frames[0] if count > 1 else 1
+        padded = np.concatenate([[frames[0] - first_gap], frames])
+
+        for i, (name, co) in enumerate(zip(names, coords)):
+            self.set_shape_key_array(object_name, name, co)
+            if i + 1 < count:
+                self.insert_shape_key_keyframes(object_name, name, padded[i:i + 3], (0.0, 1.0, 0.0))
+            else:
+                self.insert_shape_key_keyframes(object_name, name, padded[i:i + 2], (0.0, 1.0))
+        return names
+
     
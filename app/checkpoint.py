@@ -0,0 +1,141 @@
+import os
+import json
+
+import numpy as np
+
+
+#面の構成を表す配列（Blender.get_mesh_arrays のキー）
+TOPOLOGY_KEYS = ("loop_vert", "loop_start", "loop_total")
+
+
+#成長の各ステップのメッシュを差分で保存するチェックポイント
+#最初のステップと keyframe_interval ステップごとは全体を、それ以外は前のステップから
+#変わった頂点の座標（と、変わった場合は面の構成）だけを圧縮した .npz に保存する
+#復元は直前の全体保存から差分を適用するので、最初から再生し直す必要はない
+#  store = CheckpointStore("/app/checkpoints")
+#  store.record(0, blender.get_mesh_arrays(name))
+#  ...
+#  blender.set_mesh_arrays(name, store.restore(120))
+class CheckpointStore:
+    #tolerance: これ以下の移動は変化とみなさない
+    #keyframe_interval を省略した場合、既存の保存先ならその保存時の値、新しい保存先なら 50
+    def __init__(self, directory: str, keyframe_interval: int = None, tolerance: float = 0.0):
+        self.directory = directory
+        self.tolerance = tolerance
+        os.makedirs(directory, exist_ok=True)
+
+        # 既存の保存先を開いた場合はステップの一覧を読み込む
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self.steps = {}
+        manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+            self.steps = {int(step): kind for step, kind in manifest["steps"].items()}
+        if keyframe_interval is None:
+            keyframe_interval = manifest.get("keyframe_interval", 50)
+        self.keyframe_interval = keyframe_interval
+        self._last = None
+
+    #保存済みのステップ番号（昇順）
+    def list_steps(self) -> list[int]:
+        return sorted(self.steps)
+
+    #ステップ step のメッシュ（get_mesh_arrays の辞書）を保存し、保存の種類（"full" / "delta"）を返す
+    def record(self, step: int, arrays: dict[str, np.ndarray]) -> str:
+        if self.steps and step <= max(self.steps):
+            raise ValueError(f"step {step} is not after the last recorded step {max(self.steps)}")
+        arrays = {key: np.asarray(value) for key, value in arrays.items()}
+        if self._last is None and self.steps:
+            # 開き直した保存先に続けて書く場合は、最後のステップを復元して差分の基準にする
+            self._last = self.restore(max(self.steps))
+
+        if self._last is None or step - self._last_keyframe() >= self.keyframe_interval:
+            kind = "full"
+            self._save(step, kind, **arrays)
+            self._last = arrays
+        else:
+            kind = "delta"
+            delta = self._delta(self._last, arrays)
+            self._save(step, kind, **delta)
+            # 次の差分は restore() で復元される状態を基準にする
+            # （tolerance 以下の移動も積み重なれば保存される）
+            self._last = self._apply_delta(self._last, delta)
+
+        self.steps[step] = kind
+        self._write_manifest()
+        return kind
+
+    #step より後のステップを削除する（step から記録し直す場合）
+    def truncate(self, step: int):
+        for later in [s for s in self.steps if s > step]:
+            os.remove(self._path(later))
+            del self.steps[later]
+        self._write_manifest()
+        # 次の record() で最後のステップを復元して差分の基準にする
+        self._last = None
+
+    #ステップ step のメッシュを復元
+    def restore(self, step: int) -> dict[str, np.ndarray]:
+        if step not in self.steps:
+            raise KeyError(f"step {step} is not recorded")
+        steps = self.list_steps()
+        position = steps.index(step)
+        start = max(i for i in range(position + 1) if self.steps[steps[i]] == "full")
+
+        arrays = self._load(steps[start])
+        for s in steps[start + 1:position + 1]:
+            arrays = self._apply_delta(arrays, self._load(s))
+        return arrays
+
+    #保存したファイルの合計サイズ（バイト）
+    def size(self) -> int:
+        return sum(os.path.getsize(self._path(step)) for step in self.steps)
+
+    def _last_keyframe(self) -> int:
+        return max(step for step, kind in self.steps.items() if kind == "full")
+
+    #前のステップからの差分
+    #座標は共通する頂点のうち動いたものと、増えた頂点の座標、面の構成は変わった場合だけ全体を持つ
+    def _delta(self, past: dict, arrays: dict) -> dict:
+        co, past_co = arrays["co"], past["co"]
+        common = min(len(co), len(past_co))
+        moved = np.abs(co[:common] - past_co[:common]).max(axis=1, initial=0.0) > self.tolerance
+        indices = np.flatnonzero(moved).astype(np.int32)
+
+        delta = {
+            "vertex_count": np.int64(len(co)),
+            "indices": indices,
+            "values": co[indices],
+            "appended": co[common:],
+        }
+        if not all(np.array_equal(arrays[key], past[key]) for key in TOPOLOGY_KEYS):
+            delta.update({key: arrays[key] for key in TOPOLOGY_KEYS})
+        return delta
+
+    def _apply_delta(self, arrays: dict, delta: dict) -> dict:
+        vertex_count = int(delta["vertex_count"])
+        co = arrays["co"]
+        common = min(vertex_count, len(co))
+        restored = np.empty((vertex_count, 3), dtype=co.dtype)
+        restored[:common] = co[:common]
+        restored[common:] = delta["appended"]
+        restored[delta["indices"]] = delta["values"]
+
+        result = {key: delta.get(key, arrays[key]) for key in TOPOLOGY_KEYS}
+        result["co"] = restored
+        return result
+
+    def _write_manifest(self):
+        with open(self._manifest_path, "w") as f:
+            json.dump({"keyframe_interval": self.keyframe_interval, "steps": self.steps}, f)
+
+    def _path(self, step: int) -> str:
+        return os.path.join(self.directory, f"{self.steps.get(step, 'delta')}_{step:06d}.npz")
+
+    def _save(self, step: int, kind: str, **arrays):
+        np.savez_compressed(os.path.join(self.directory, f"{kind}_{step:06d}.npz"), **arrays)
+
+    def _load(self, step: int) -> dict[str, np.ndarray]:
+        with np.load(self._path(step)) as data:
+            return {key: data[key] for key in data.files}
@@ -0,0 +1,132 @@
+import time
+import numpy as np
+
+
+#立方体の 6 面の方向
+CUBE_DIRECTIONS = (
+    (1, 0, 0),
+    (-1, 0, 0),
+    (0, 1, 0),
+    (0, -1, 0),
+    (0, 0, 1),
+    (0, 0, -1),
+)
+
+
+#ビスマス骸晶の成長シミュレーション
+#各ステップで、各成長方向の側にある凸頂点をその方向へ成長速度だけ移動する
+#稜や角（凸頂点）だけが伸び、平らな面の内側は取り残されるため骸晶の窪みができる
+#凸判定は前のステップで動いた頂点を含む面の頂点だけをやり直す
+#  simulator = GrowthSimulator(blender, cube_name, rates={(1, 0, 0): 0.2})
+#  simulator.run(20)
+class GrowthSimulator:
+    #rates: {方向: 1 ステップあたりの成長量}、指定しない方向は default_rate
+    #keyframe=True の場合、各ステップの形状をシェイプキーとして frame_step フレームごとに記録する
+    #checkpoints（CheckpointStore）を指定した場合、成長前と各ステップの形状を差分で保存する
+    def __init__(self, blender, object_name: str, rates: dict = None, default_rate: float = 0.1,
+                 tolerance: float = 0.0, keyframe: bool = False, frame_step: int = 1, checkpoints=None):
+        self.blender = blender
+        self.object_name = object_name
+        self.tolerance = tolerance
+        self.keyframe = keyframe
+        self.frame_step = frame_step
+        self.checkpoints = checkpoints
+
+        rates = {tuple(direction): rate for direction, rate in (rates or {}).items()}
+        keys = list(CUBE_DIRECTIONS) + [d for d in rates if d not in CUBE_DIRECTIONS]
+        directions = np.array(keys, dtype=np.float32)
+        self.directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+        self.rates = np.array([rates.get(d, default_rate) for d in keys], dtype=np.float32)
+
+        self.step_index = 0
+        self.timings = []
+        self.invalidate()
+
+    #凸判定とトポロジーのキャッシュを破棄（メッシュを外部で編集した場合）
+    def invalidate(self):
+        self._convex = None
+        self._dirty = None
+
+    #凸判定を更新（初回は全体、以降は dirty な頂点だけ）
+    def _classify(self, vertex_count: int) -> int:
+        if self._convex is None or len(self._convex) != vertex_count:
+            self._convex = self.blender.get_convex_vertex_mask(self.object_name, self.tolerance)
+            return vertex_count
+
+        region = self._dirty
+        if len(region):
+            partial = self.blender.get_convex_vertex_mask(self.object_name, self.tolerance, vertices=region)
+            self._convex[region] = partial[region]
+        return len(region)
+
+    #moved（頂点インデックス列）の頂点を含む面の全頂点（次のステップで凸判定が変わりうる頂点）
+    def _touched_region(self, moved: np.ndarray) -> np.ndarray:
+        topology = self.blender.get_topology(self.object_name)
+        return np.union1d(moved, topology.vertices_of_faces(topology.faces_of_vertices(moved)))
+
+    #1 ステップ進める
+    def step(self) -> dict:
+        start = time.perf_counter()
+        blender = self.blender
+
+        co = blender.get_vertex_array(self.object_name)
+        reclassified = self._classify(len(co))
+        if self.keyframe and self.step_index == 0:
+            # 成長前の形状を Basis にする
+            blender.set_shape_key_array(self.object_name, "Basis", co)
+        if self.checkpoints is not None and self.step_index == 0:
+            self.checkpoints.record(0, blender.get_mesh_arrays(self.object_name))
+
+        # 各方向の側にある凸頂点を、その方向へ成長速度だけ移動
+        convex = np.flatnonzero(self._convex)
+        sides = blender.get_vertices_in_directions(self.object_name, self.directions, vertices=convex)[:, convex]
+        offsets = sides.T.astype(np.float32) @ (self.directions * self.rates[:, None])
+        growing = sides.any(axis=0)
+        moved = convex[growing]
+
+        co[moved] += offsets[growing]
+        blender.set_vertex_array(self.object_name, co)
+        self._dirty = self._touched_region(moved)
+
+        self.step_index += 1
+        if self.keyframe:
+            self._keyframe_step(co)
+        if self.checkpoints is not None:
+            self.checkpoints.record(self.step_index, blender.get_mesh_arrays(self.object_name))
+
+        timing = {
+            "step": self.step_index,
+            "seconds": time.perf_counter() - start,
+            "moved": len(moved),
+            "reclassified": reclassified,
+        }
+        self.timings.append(timing)
+        return timing
+
+    #チェックポイントからステップ step の形状に戻す
+    #step より後のチェックポイントは削除し、続きの step() で記録し直す
+    def seek(self, step: int):
+        self.blender.set_mesh_arrays(self.object_name, self.checkpoints.restore(step))
+        self.checkpoints.truncate(step)
+        self.step_index = step
+        self.invalidate()
+
+    #steps ステップ進め、各ステップの計測結果を返す
+    def run(self, steps: int) -> list[dict]:
+        return [self.step() for _ in range(steps)]
+
+    #現在の形状をシェイプキーとして記録し、前のステップのフレームから値 0 → 1 になるようにキーフレームを打つ
+    #一つ前のステップのキーはこのフレームで 0 に戻す（最新のステップのキーは 1 のままなので最後の形状を保つ）
+    def _keyframe_step(self, co: np.ndarray):
+        name = f"step_{self.step_index}"
+        self.blender.set_shape_key_array(self.object_name, name, co)
+        frame = self.last_frame()
+        self.blender.insert_shape_key_keyframes(self.object_name, name, (frame - self.frame_step, frame), (0.0, 1.0))
+
+        previous = f"step_{self.step_index - 1}"
+        if previous in self.blender.get_shape_keys(self.object_name):
+            self.blender.insert_shape_key_keyframes(self.object_name, previous, (frame,), (0.0,))
+
+    #最後に記録したステップのフレーム
+    def last_frame(self) -> int:
+        return self.step_index * self.frame_step
@@ -1,4 +1,5 @@
 from blender import Blender
+from growth import GrowthSimulator
 import math, bmesh
 
 def animation():
@@ -80,9 +81,9 @@ def test_convex_detection():
     
     # 凸頂点を可視化（少し外側に移動）
     print("\nVisualizing convex vertices...")
-    for idx in convex_verts:
-        x, y, z = blender.locate_vertex(cube_name, idx)
-        blender.move_vertex(cube_name, idx, x * 1.3, y * 1.3, z * 1.3)
+    coords = blender.get_vertex_array(cube_name)
+    coords[convex_verts] *= 1.3
+    blender.set_vertex_array(cube_name, coords)
     
     blender.render("/app/convex_test.png")
     blender.save_scene("/app/convex_test.blend")
@@ -108,9 +109,9 @@ def test_convex_detection_dramatic():
     
     # 凸頂点を大きく外側に移動（2倍！）
     print("\nMoving convex vertices outward (2x)...")
-    for idx in convex_verts:
-        x, y, z = blender.locate_vertex(cube_name, idx)
-        blender.move_vertex(cube_name, idx, x * 2.0, y * 2.0, z * 2.0)
+    coords = blender.get_vertex_array(cube_name)
+    coords[convex_verts] *= 2.0
+    blender.set_vertex_array(cube_name, coords)
     
     # 編集後の画像
     blender.render("/app/after.png")
@@ -297,11 +298,11 @@ def test_suzanne_convex():
     
     # 凸頂点を可視化（少し外側に移動）
     print("\nVisualizing convex vertices...")
-    for idx in convex_verts:
-        x, y, z = blender.locate_vertex(suzanne_name, idx)
-        # 原点からの方向に少し移動
-        scale = 1.1
-        blender.move_vertex(suzanne_name, idx, x * scale, y * scale, z * scale)
+    coords = blender.get_vertex_array(suzanne_name)
+    # 原点からの方向に少し移動
+    scale = 1.1
+    coords[convex_verts] *= scale
+    blender.set_vertex_array(suzanne_name, coords)
     
     blender.render("/app/suzanne_convex_test.png")
     blender.save_scene("/app/suzanne_convex_test.blend")
@@ -548,10 +549,15 @@ def test_step2_multiple_directions():
         (0, 0, 2, (0, 0, -1), 2.0, "-Z"),
     ]
     
+    stretches = []
     for px, py, pz, direction, distance, label in positions:
         cube = blender.add_cube(px, py, pz)
         blender.scale_object_uniform(cube, 0.3)
-        blender.stretch_cube_along_vector(cube, direction, distance)
+        stretches.append((cube, direction, distance))
+
+    # 全ての立方体をまとめて伸長
+    blender.stretch_objects(stretches)
+    for px, py, pz, direction, distance, label in positions:
         print(f"Stretched cube at ({px}, {py}, {pz}) in {label} direction by {distance}")
     
     blender.render("/app/step2_multi.png")
@@ -559,6 +565,36 @@ def test_step2_multiple_directions():
     
     print("\n✓ Saved: /app/step2_multi.png")
 
+def test_growth():
+    """骸晶成長シミュレーションのテスト"""
+    blender = Blender()
+    
+    print("\n=== Hopper Crystal Growth ===\n")
+    
+    # 立方体の面を細分化しておく（凸頂点だけが伸び、面の内側は取り残される）
+    cube = blender.add_cube(0, 0, 0)
+    mesh = blender.get_object(cube).data
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bmesh.ops.subdivide_edges(bm, edges=bm.edges[:], cuts=8, use_grid_fill=True)
+    bm.to_mesh(mesh)
+    bm.free()
+    print(f"Vertices: {blender.count_vertex(cube)}")
+    
+    # +Z 方向だけ速く成長させ、各ステップを 5 フレームごとのシェイプキーとして記録
+    simulator = GrowthSimulator(blender, cube, rates={(0, 0, 1): 0.1}, default_rate=0.05,
+                                keyframe=True, frame_step=5)
+    for timing in simulator.run(20):
+        print(f"  Step {timing['step']:3d}: {timing['seconds'] * 1000:7.2f} ms, "
+              f"moved {timing['moved']}, reclassified {timing['reclassified']}")
+    
+    # 最後のステップのフレームで成長後の形状をレンダリング
+    blender.scene.frame_set(simulator.last_frame())
+    blender.render("/app/growth.png")
+    blender.save_scene("/app/growth.blend")
+    
+    print("\n✓ Saved: /app/growth.png")
+
 if __name__ == "__main__":
 
     #テスト用
@@ -578,5 +614,6 @@ if __name__ == "__main__":
     #test_boolean_union()
     #test_boolean_multiple()
     #test_step1_direction_vertices()
+    #test_growth()
     test_step2_stretch()
     test_step2_multiple_directions()
\ No newline at end of file
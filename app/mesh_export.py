@@ -0,0 +1,136 @@
+import os
+import json
+import struct
+
+import numpy as np
+
+
+#一度に書き出す三角形（頂点）の数
+CHUNK_SIZE = 1 << 18
+
+
+#頂点座標 (V, 3) と三角形 (T, 3) をファイルへ書き出す（形式は拡張子で判定）
+#.ply / .stl / .glb はバイナリ形式で、CHUNK_SIZE ごとに変換しながら書き出すため
+#出力全体をメモリ上に作らない
+def export_arrays(path: str, co: np.ndarray, triangles: np.ndarray, chunk_size: int = CHUNK_SIZE) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORTERS:
+        raise ValueError(f"unsupported mesh format: {ext}")
+    co = np.ascontiguousarray(co, dtype=np.float32).reshape(-1, 3)
+    triangles = np.ascontiguousarray(triangles, dtype=np.uint32).reshape(-1, 3)
+    EXPORTERS[ext](path, co, triangles, chunk_size)
+    return path
+
+
+#array を chunk_size 行ごとに書き出す
+def _write_chunks(f, array: np.ndarray, chunk_size: int, convert=None):
+    for start in range(0, len(array), chunk_size):
+        chunk = array[start:start + chunk_size]
+        f.write((convert(chunk) if convert is not None else chunk).tobytes())
+
+
+#バイナリ PLY（リトルエンディアン）
+def write_ply(path: str, co: np.ndarray, triangles: np.ndarray, chunk_size: int = CHUNK_SIZE):
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        f"element vertex {len(co)}\n"
+        "property float x\n"
+        "property float y\n"
+        "property float z\n"
+        f"element face {len(triangles)}\n"
+        "property list uchar int vertex_indices\n"
+        "end_header\n"
+    )
+    face_dtype = np.dtype([("count", "u1"), ("vertices", "<i4", 3)])
+
+    def to_faces(chunk):
+        faces = np.empty(len(chunk), dtype=face_dtype)
+        faces["count"] = 3
+        faces["vertices"] = chunk
+        return faces
+
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        _write_chunks(f, co.astype("<f4", copy=False), chunk_size)
+        _write_chunks(f, triangles, chunk_size, to_faces)
+
+
+#バイナリ STL（三角形ごとに法線と 3 頂点の座標）
+def write_stl(path: str, co: np.ndarray, triangles: np.ndarray, chunk_size: int = CHUNK_SIZE):
+    record_dtype = np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+
+    def to_records(chunk):
+        corners = co[chunk]
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        records = np.zeros(len(chunk), dtype=record_dtype)
+        records["normal"] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+        records["vertices"] = corners
+        return records
+
+    with open(path, "wb") as f:
+        f.write(b"Bismuth binary STL".ljust(80, b"\0"))
+        f.write(struct.pack("<I", len(triangles)))
+        _write_chunks(f, triangles, chunk_size, to_records)
+
+
+#glTF バイナリ（.glb）、座標は glTF の Y 軸上向きに変換する
+def write_glb(path: str, co: np.ndarray, triangles: np.ndarray, chunk_size: int = CHUNK_SIZE):
+    # Blender (Z 上向き) → glTF (Y 上向き): (x, y, z) → (x, z, -y)
+    def to_y_up(chunk):
+        return np.stack([chunk[:, 0], chunk[:, 2], -chunk[:, 1]], axis=1).astype("<f4")
+
+    position_bytes = len(co) * 12
+    index_bytes = len(triangles) * 12
+    if len(co):
+        # 変換後の最小・最大（accessor に必須）
+        lower, upper = co.min(axis=0), co.max(axis=0)
+        minimum = [float(lower[0]), float(lower[2]), float(-upper[1])]
+        maximum = [float(upper[0]), float(upper[2]), float(-lower[1])]
+    else:
+        minimum = maximum = [0.0, 0.0, 0.0]
+
+    document = {
+        "asset": {"version": "2.0", "generator": "Bismuth mesh_export"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+        "buffers": [{"byteLength": position_bytes + index_bytes}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": position_bytes, "target": 34962},
+            {"buffer": 0, "byteOffset": position_bytes, "byteLength": index_bytes, "target": 34963},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(co), "type": "VEC3",
+             "min": minimum, "max": maximum},
+            {"bufferView": 1, "componentType": 5125, "count": len(triangles) * 3, "type": "SCALAR"},
+        ],
+    }
+    json_chunk = json.dumps(document, separators=(",", ":")).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    # 座標も添字も 4 バイト単位なのでバイナリチャンクの詰め物は不要
+    bin_length = position_bytes + index_bytes
+    total = 12 + 8 + len(json_chunk) + 8 + bin_length
+
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, total))
+        f.write(struct.pack("<I4s", len(json_chunk), b"JSON"))
+        f.write(json_chunk)
+        f.write(struct.pack("<I4s", bin_length, b"BIN\0"))
+        _write_chunks(f, co, chunk_size, to_y_up)
+        _write_chunks(f, triangles.astype("<u4", copy=False), chunk_size)
+
+
+#NumPy の圧縮アーカイブ（vertices, triangles）
+def write_npz(path: str, co: np.ndarray, triangles: np.ndarray, chunk_size: int = CHUNK_SIZE):
+    np.savez_compressed(path, vertices=co, triangles=triangles)
+
+
+EXPORTERS = {
+    ".ply": write_ply,
+    ".stl": write_stl,
+    ".glb": write_glb,
+    ".npz": write_npz,
+}
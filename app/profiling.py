@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import inspect
+import threading
+import functools
+from contextlib import contextmanager
+
+import bpy
+import bmesh
+
+
+#BMesh とメッシュ間の変換として数える BMesh のメソッド
+CONVERSIONS = ("from_mesh", "to_mesh")
+
+
+#Blender クラスのメソッド単位のプロファイラ（使うときだけ有効にする）
+#呼び出し回数、累積時間・自身の時間、BMesh の from_mesh / to_mesh の回数（呼び出し先を含む）と
+#bpy.ops の呼び出し時間を記録し、表または Chrome のトレース形式（chrome://tracing, Perfetto）で出力する
+#  profiler = Profiler()
+#  with profiler.instrument():
+#      blender.stretch_cube_along_vector(name, (1, 0, 0), 0.5)
+#  print(profiler.summary())
+#  profiler.save_chrome_trace("/app/trace.json")
+class Profiler:
+    #count_conversions=False の場合は sys.setprofile を使わない（BMesh 変換は数えないが計測の負荷が小さい）
+    def __init__(self, count_conversions: bool = True):
+        self.count_conversions = count_conversions
+        self.clear()
+
+    #記録を消去
+    def clear(self):
+        self.stats = {}
+        self.events = []
+        self._stack = []
+        self._origin = time.perf_counter()
+        self._previous_profile = None
+
+    #cls の公開メソッドと bpy.ops の呼び出しを計測する（終了時に元へ戻す）
+    #contextmanager のメソッド（mesh_session など）は with ブロック全体を一回の呼び出しとして計測する
+    @contextmanager
+    def instrument(self, cls=None, ops: bool = True):
+        if cls is None:
+            from blender import Blender
+            cls = Blender
+
+        patched = []
+        for name, function in list(vars(cls).items()):
+            if not inspect.isfunction(function):
+                continue
+            if name.startswith("_") and name != "__init__":
+                continue
+            label = f"{cls.__name__}.{name}"
+            inner = getattr(function, "__wrapped__", None)
+            if inner is not None and inspect.isgeneratorfunction(inner):
+                wrapper = contextmanager(self._wrap_generator(label, "blender", inner))
+            else:
+                wrapper = self._wrap(label, "blender", function)
+            patched.append((cls, name, function))
+            setattr(cls, name, wrapper)
+
+        if ops:
+            op_class = type(bpy.ops.object.mode_set)
+            call = op_class.__call__
+            patched.append((op_class, "__call__", call))
+            profiler = self
+
+            @functools.wraps(call)
+            def op_call(op, *args, **kwargs):
+                profiler._enter("bpy.ops." + op.idname_py(), "bpy.ops")
+                try:
+                    return call(op, *args, **kwargs)
+                finally:
+                    profiler._exit()
+
+            op_class.__call__ = op_call
+
+        try:
+            yield self
+        finally:
+            for owner, name, function in reversed(patched):
+                setattr(owner, name, function)
+
+    def _wrap(self, name: str, category: str, function):
+        profiler = self
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler._enter(name, category)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler._exit()
+
+        return wrapper
+
+    def _wrap_generator(self, name: str, category: str, function):
+        profiler = self
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler._enter(name, category)
+            try:
+                yield from function(*args, **kwargs)
+            finally:
+                profiler._exit()
+
+        return wrapper
+
+    def _enter(self, name: str, category: str):
+        # 一番外側の呼び出しの間だけ C 関数の呼び出しを監視する
+        if not self._stack and self.count_conversions:
+            self._previous_profile = sys.getprofile()
+            sys.setprofile(self._on_profile_event)
+        self._stack.append({
+            "name": name,
+            "category": category,
+            "start": time.perf_counter(),
+            "children": 0.0,
+            "from_mesh": 0,
+            "to_mesh": 0,
+        })
+
+    def _exit(self):
+        end = time.perf_counter()
+        entry = self._stack.pop()
+        elapsed = end - entry["start"]
+        if self._stack:
+            self._stack[-1]["children"] += elapsed
+        elif self.count_conversions:
+            sys.setprofile(self._previous_profile)
+            self._previous_profile = None
+
+        stat = self.stats.setdefault(entry["name"], {
+            "calls": 0, "total": 0.0, "own": 0.0, "max": 0.0, "from_mesh": 0, "to_mesh": 0,
+        })
+        stat["calls"] += 1
+        stat["total"] += elapsed
+        stat["own"] += elapsed - entry["children"]
+        stat["max"] = max(stat["max"], elapsed)
+        stat["from_mesh"] += entry["from_mesh"]
+        stat["to_mesh"] += entry["to_mesh"]
+
+        self.events.append({
+            "name": entry["name"],
+            "cat": entry["category"],
+            "ph": "X",
+            "ts": (entry["start"] - self._origin) * 1e6,
+            "dur": elapsed * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"from_mesh": entry["from_mesh"], "to_mesh": entry["to_mesh"]},
+        })
+
+    #BMesh.from_mesh / to_mesh の呼び出しを、呼び出し中の全メソッドに数える
+    def _on_profile_event(self, frame, event, arg):
+        if event != "c_call" or type(getattr(arg, "__self__", None)) is not bmesh.types.BMesh:
+            return
+        name = arg.__name__
+        if name in CONVERSIONS:
+            for entry in self._stack:
+                entry[name] += 1
+
+    #メソッドごとの集計表（sort は "total" / "own" / "calls" / "from_mesh" / "to_mesh"）
+    #同じメソッドが入れ子で呼ばれた場合、累積時間と変換回数は呼び出しごとに重ねて数える
+    def summary(self, sort: str = "total", limit: int = None) -> str:
+        rows = sorted(self.stats.items(), key=lambda item: item[1][sort], reverse=True)[:limit]
+        width = max([len("method")] + [len(name) for name, _ in rows])
+        lines = [
+            f"{'method':<{width}} {'calls':>8} {'total ms':>11} {'per call ms':>12} {'own ms':>11} "
+            f"{'from_mesh':>10} {'to_mesh':>8}"
+        ]
+        for name, stat in rows:
+            lines.append(
+                f"{name:<{width}} {stat['calls']:>8d} {stat['total'] * 1000:>11.3f} "
+                f"{stat['total'] / stat['calls'] * 1000:>12.3f} {stat['own'] * 1000:>11.3f} "
+                f"{stat['from_mesh']:>10d} {stat['to_mesh']:>8d}"
+            )
+        return "\n".join(lines)
+
+    #Chrome のトレース形式で書き出す
+    def save_chrome_trace(self, path: str) -> str:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        return path
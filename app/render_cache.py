@@ -0,0 +1,53 @@
+import os
+import shutil
+
+
+#シーンのハッシュ値をキーにレンダリング結果の画像を保存するディスクキャッシュ
+#合計サイズが max_bytes を超えたら、最後に使われた時刻が古いものから削除する
+class RenderCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key + ext)
+
+    #キャッシュ済みの画像パスを返す（無ければ None）
+    def get(self, key: str, ext: str = ".png") -> str:
+        path = self._path(key, ext)
+        if not os.path.exists(path):
+            return None
+        # 使用時刻を更新（LRU）
+        os.utime(path)
+        return path
+
+    #レンダリング結果の画像をキャッシュへ登録
+    def put(self, key: str, image_path: str, ext: str = ".png") -> str:
+        path = self._path(key, ext)
+        tmp_path = path + ".tmp"
+        shutil.copyfile(image_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    #上限を超えた分を古い順に削除
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    #キャッシュを全て削除
+    def clear(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file():
+                os.remove(entry.path)
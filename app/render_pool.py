@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import multiprocessing
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import bpy
+
+
+#ワーカープロセス側でのレンダリング（プロセスごとに独立した bpy を使う）
+def _render_job(scene_path: str, output_path: str, settings: dict, threads: int) -> str:
+    from blender import Blender
+
+    # コア数をワーカー間で分け合う
+    job_settings = {"render.threads_mode": "FIXED", "render.threads": threads}
+    job_settings.update(settings or {})
+
+    # ワーカーは同じパスに保存し直されたシーンも受け取るため、スナップショットを使わず毎回読み込む
+    blender = Blender(scene_path, reuse=False)
+    blender.render(output_path, settings=job_settings)
+    return output_path
+
+
+#bpy は import 時に自身の scripts ディレクトリを sys.path の先頭へ追加するため、
+#そのまま spawn すると子プロセスで別の bpy パッケージが import されてしまう
+@contextmanager
+def _without_bpy_script_paths():
+    past = list(sys.path)
+    bpy_dirs = tuple(bpy.utils.resource_path(kind) + os.sep for kind in ("LOCAL", "USER"))
+    sys.path[:] = [path for path in past if not path.startswith(bpy_dirs)]
+    try:
+        yield
+    finally:
+        sys.path[:] = past
+
+
+#複数プロセスで並列にレンダリングするプール
+#  with RenderPool(workers=4) as pool:
+#      futures = [pool.submit("/app/step2_test.blend", f"/app/out_{i}.png") for i in range(8)]
+#      paths = [f.result() for f in futures]
+class RenderPool:
+    def __init__(self, workers: int = None, threads_per_worker: int = None):
+        cpu_count = os.cpu_count() or 1
+        self.workers = workers or cpu_count
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.workers)
+        # bpy は fork に対応していないため spawn で起動する
+        with _without_bpy_script_paths():
+            self._pool = multiprocessing.get_context("spawn").Pool(self.workers)
+        self._tempdir = tempfile.TemporaryDirectory(prefix="render_pool_")
+
+    #.blend ファイルのレンダリングを投入し、出力パスを返す Future を得る
+    def submit(self, scene_path: str, output_path: str, settings: dict = None) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self._pool.apply_async(
+            _render_job,
+            (os.path.abspath(scene_path), os.path.abspath(output_path), settings, self.threads_per_worker),
+            callback=future.set_result,
+            error_callback=future.set_exception,
+        )
+        return future
+
+    #Blender インスタンスの現在のシーンを一時ファイルに保存してレンダリングを投入
+    def submit_scene(self, blender, output_path: str, settings: dict = None) -> Future:
+        fd, scene_path = tempfile.mkstemp(suffix=".blend", dir=self._tempdir.name)
+        os.close(fd)
+        blender.save_scene_copy(scene_path)
+        future = self.submit(scene_path, output_path, settings)
+        future.add_done_callback(lambda _: os.remove(scene_path))
+        return future
+
+    #(scene_path, output_path, settings) のジョブ列をまとめて投入
+    def map(self, jobs) -> list[Future]:
+        return [self.submit(*job) for job in jobs]
+
+    def shutdown(self):
+        self._pool.close()
+        self._pool.join()
+        self._tempdir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
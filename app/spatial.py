@@ -0,0 +1,77 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+#頂点座標 (V, 3) の KD 木
+#座標が変わったら作り直す（Blender.get_vertex_index が管理する）
+class VertexIndex:
+    def __init__(self, co: np.ndarray, matrix: tuple = None):
+        self.co = np.asarray(co, dtype=np.float64).reshape(-1, 3)
+        # world_space で作った場合のオブジェクトの変換（変わっていれば作り直しが必要）
+        self.matrix = matrix
+        self.tree = cKDTree(self.co)
+
+    #各点 (N, 3) に近い k 個の頂点
+    #戻り値: (距離 (N, k), 頂点インデックス (N, k))、頂点数が k 未満の場合は距離 inf・インデックス V で埋まる
+    def nearest(self, points, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        distances, indices = self.tree.query(points, k=k)
+        return distances.reshape(len(points), k), indices.reshape(len(points), k)
+
+    #点から radius 以内の頂点インデックス（近い順）
+    def within(self, point, radius: float) -> np.ndarray:
+        point = np.asarray(point, dtype=np.float64).reshape(3)
+        indices = np.asarray(self.tree.query_ball_point(point, radius), dtype=np.int64)
+        distances = np.linalg.norm(self.co[indices] - point, axis=1)
+        return indices[np.argsort(distances, kind="stable")]
+
+    #距離 radius 以内にある頂点の組 (M, 2)（i < j）
+    def pairs(self, radius: float) -> np.ndarray:
+        return self.tree.query_pairs(radius, output_type="ndarray")
+
+
+#オブジェクトのワールド座標でのバウンディングボックスの索引
+#中心の KD 木（最大ノルム）で候補を絞り込み、箱どうしの重なりを厳密に判定する
+class ObjectBoundsIndex:
+    def __init__(self, names: list[str], mins: np.ndarray, maxs: np.ndarray):
+        self.names = list(names)
+        self.mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+        self.maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+        self.centers = (self.mins + self.maxs) / 2
+        self.half_sizes = (self.maxs - self.mins) / 2
+        self.max_half_size = float(self.half_sizes.max()) if len(self.names) else 0.0
+        self.tree = cKDTree(self.centers) if len(self.names) else None
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions
+
+    #箱 [box_min, box_max] と重なるオブジェクトのインデックス
+    def overlapping(self, box_min, box_max) -> np.ndarray:
+        if self.tree is None:
+            return np.zeros(0, dtype=np.int64)
+        box_min = np.asarray(box_min, dtype=np.float64)
+        box_max = np.asarray(box_max, dtype=np.float64)
+        center = (box_min + box_max) / 2
+        radius = float(((box_max - box_min) / 2).max()) + self.max_half_size
+        candidates = np.asarray(self.tree.query_ball_point(center, radius, p=np.inf), dtype=np.int64)
+        overlap = np.all((self.mins[candidates] <= box_max) & (box_min <= self.maxs[candidates]), axis=1)
+        return np.sort(candidates[overlap])
+
+    #オブジェクト name と重なる他のオブジェクト名
+    def overlapping_objects(self, name: str) -> list[str]:
+        i = self._positions[name]
+        return [self.names[j] for j in self.overlapping(self.mins[i], self.maxs[i]) if j != i]
+
+    #点 (3,) を含むオブジェクト名
+    def containing(self, point) -> list[str]:
+        return [self.names[j] for j in self.overlapping(point, point)]
+
+    #重なっている全てのオブジェクトの組 (M, 2)（インデックス、i < j）
+    def overlap_pairs(self) -> np.ndarray:
+        if self.tree is None:
+            return np.zeros((0, 2), dtype=np.int64)
+        pairs = self.tree.query_pairs(2 * self.max_half_size, p=np.inf, output_type="ndarray")
+        i, j = pairs[:, 0], pairs[:, 1]
+        overlap = np.all((self.mins[i] <= self.maxs[j]) & (self.mins[j] <= self.maxs[i]), axis=1)
+        return pairs[overlap]
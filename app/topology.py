@@ -0,0 +1,106 @@
+import numpy as np
+
+
+#rows[i] → cols[i] の対応を CSR 形式 (indptr, indices) にまとめる
+#要素 r の隣接は indices[indptr[r]:indptr[r + 1]]
+def _csr(rows: np.ndarray, cols: np.ndarray, count: int) -> tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(count + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=count), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32)
+
+
+#CSR (indptr, indices) の rows の行をまとめて取り出す（重複は除かない）
+#戻り値: (要素 (N,), 各要素が何番目の行のものか (N,))
+def _gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+    starts = indptr[rows].astype(np.int64)
+    lengths = indptr[rows + 1] - starts
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    positions = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths) + starts[owner]
+    return indices[positions], owner
+
+
+#メッシュの隣接関係（頂点 → エッジ、頂点 → 面、エッジ → ループ / 面、面 → 頂点）を
+#int32 の CSR 配列で保持する索引
+class MeshTopology:
+    def __init__(self, mesh):
+        self.mesh_pointer = mesh.as_pointer()
+        vertex_count = len(mesh.vertices)
+        edge_count = len(mesh.edges)
+        self.counts = (vertex_count, edge_count, len(mesh.loops), len(mesh.polygons))
+
+        edge_verts = np.empty(edge_count * 2, dtype=np.int32)
+        mesh.edges.foreach_get("vertices", edge_verts)
+        self.edge_verts = edge_verts.reshape(-1, 2)
+
+        self.loop_vert = np.empty(len(mesh.loops), dtype=np.int32)
+        self.loop_edge = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", self.loop_vert)
+        mesh.loops.foreach_get("edge_index", self.loop_edge)
+
+        self.loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+        self.loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_start", self.loop_start)
+        mesh.polygons.foreach_get("loop_total", self.loop_total)
+
+        # ループ → 所属する面、面内で次のループ
+        self.loop_face = np.repeat(np.arange(len(self.loop_start), dtype=np.int32), self.loop_total)
+        self.loop_next = np.arange(1, len(self.loop_vert) + 1, dtype=np.int32)
+        self.loop_next[self.loop_start + self.loop_total - 1] = self.loop_start
+
+        # 面 → 頂点（面のループは連続して並んでいる）
+        self.face_vert_indptr = np.append(self.loop_start, len(self.loop_vert)).astype(np.int32)
+
+        self.vert_edge_indptr, self.vert_edges = _csr(
+            self.edge_verts.ravel(), np.repeat(np.arange(edge_count, dtype=np.int32), 2), vertex_count
+        )
+        self.vert_face_indptr, self.vert_faces = _csr(self.loop_vert, self.loop_face, vertex_count)
+        self.edge_loop_indptr, self.edge_loops = _csr(
+            self.loop_edge, np.arange(len(self.loop_edge), dtype=np.int32), edge_count
+        )
+        self.edge_faces = self.loop_face[self.edge_loops]
+
+    #メッシュが索引を作ったときと同じものか（要素数が変わっていれば作り直しが必要）
+    def matches(self, mesh) -> bool:
+        counts = (len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons))
+        return mesh.as_pointer() == self.mesh_pointer and counts == self.counts
+
+    #頂点に接続するエッジ
+    def vertex_edges(self, vertex_index: int) -> np.ndarray:
+        return self.vert_edges[self.vert_edge_indptr[vertex_index]:self.vert_edge_indptr[vertex_index + 1]]
+
+    #頂点を共有する面
+    def vertex_faces(self, vertex_index: int) -> np.ndarray:
+        return self.vert_faces[self.vert_face_indptr[vertex_index]:self.vert_face_indptr[vertex_index + 1]]
+
+    #エッジを共有する面
+    def faces_of_edge(self, edge_index: int) -> np.ndarray:
+        return self.edge_faces[self.edge_loop_indptr[edge_index]:self.edge_loop_indptr[edge_index + 1]]
+
+    #面の頂点（ループ順）
+    def face_vertices(self, face_index: int) -> np.ndarray:
+        return self.loop_vert[self.face_vert_indptr[face_index]:self.face_vert_indptr[face_index + 1]]
+
+    #複数の頂点に接続するエッジ（重複なし）
+    def edges_of_vertices(self, vertices) -> np.ndarray:
+        return np.unique(_gather(self.vert_edge_indptr, self.vert_edges, vertices)[0])
+
+    #複数の頂点を共有する面（重複なし）
+    def faces_of_vertices(self, vertices) -> np.ndarray:
+        return np.unique(_gather(self.vert_face_indptr, self.vert_faces, vertices)[0])
+
+    #複数の面の頂点（重複なし）
+    def vertices_of_faces(self, faces) -> np.ndarray:
+        return np.unique(_gather(self.face_vert_indptr, self.loop_vert, faces)[0])
+
+    #面をちょうど 2 つ持つエッジと、その 2 つのループ
+    #edges を指定した場合はその中から選ぶ
+    def manifold_edges(self, edges=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if edges is None:
+            edges = np.flatnonzero(np.diff(self.edge_loop_indptr) == 2)
+        else:
+            edges = np.asarray(edges, dtype=np.int64)
+            edges = edges[self.edge_loop_indptr[edges + 1] - self.edge_loop_indptr[edges] == 2]
+        first = self.edge_loop_indptr[edges]
+        return edges, self.edge_loops[first], self.edge_loops[first + 1]